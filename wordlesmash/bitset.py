@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class Bitset:
+    '''
+    Immutable set of word indices stored as the bits of a Python int, so
+    set operations are word-parallel and a set of any size pickles to a
+    few bytes per 8 indices of its universe. Iteration yields the indices
+    in ascending order.
+    '''
+    __slots__ = ('bits',)
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    @classmethod
+    def from_indices(cls, indices):
+        ''' Return the Bitset of an iterable or int array of indices '''
+        if not isinstance(indices, np.ndarray):
+            indices = np.fromiter(indices, dtype=np.intp)
+        if not len(indices):
+            return cls()
+
+        mask = np.zeros(int(indices.max()) + 1, dtype=bool)
+        mask[indices] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def from_mask(cls, mask):
+        ''' Return the Bitset of the indices where a bool array is True '''
+        data = np.packbits(np.asarray(mask, dtype=bool), bitorder='little')
+        return cls(int.from_bytes(data.tobytes(), 'little'))
+
+    def indices(self):
+        ''' Return the indices as a sorted int array '''
+        data = self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little')
+        mask = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+        return mask.nonzero()[0].astype(np.intp, copy=False)
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __bool__(self):
+        return bool(self.bits)
+
+    def __iter__(self):
+        return iter(self.indices().tolist())
+
+    def __contains__(self, index):
+        return index >= 0 and bool(self.bits >> index & 1)
+
+    def __and__(self, other):
+        return Bitset(self.bits & other.bits)
+
+    def __or__(self, other):
+        return Bitset(self.bits | other.bits)
+
+    def __sub__(self, other):
+        return Bitset(self.bits & ~other.bits)
+
+    def __xor__(self, other):
+        return Bitset(self.bits ^ other.bits)
+
+    def __eq__(self, other):
+        if not isinstance(other, Bitset):
+            return NotImplemented
+        return self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __reduce__(self):
+        return (Bitset, (self.bits,))
+
+    def __repr__(self):
+        return f"Bitset({self.indices().tolist()})"
@@ -0,0 +1,56 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=1 << 16)
+def max_solved_by_level(n, max_clues):
+    '''
+    Return the most of n candidates that any search can solve at each level,
+    as a tuple, when no pick produces more than max_clues distinct clues. A
+    level has at most max_clues times as many nodes as the level above, and
+    no more nodes than unsolved candidates, and each node solves at most
+    one candidate. Solving as many as possible at each level maximizes the
+    number solved by every level at once, so the profile of any route set
+    for the candidates is no better than this one.
+    '''
+    levels = []
+    nodes = 1
+    while n > 0:
+        solved = min(nodes, n)
+        levels.append(solved)
+        n -= solved
+        nodes = min(nodes * max_clues, n)
+    return tuple(levels)
+
+
+def min_profile(n, depth, max_clues):
+    '''
+    Return a lower bound on the depth profile of the routes solving a node's
+    n candidates, where depth is the length of the node's pick history.
+    '''
+    return [0] * depth + list(max_solved_by_level(n, max_clues))
+
+
+def pick_min_profile(partition, depth, max_clues, all_green):
+    '''
+    Return a lower bound on the depth profile of the routes through a pick,
+    given the Partition of the node's candidates by its clues, where depth
+    is the length of the node's pick history. The routes of each clue group
+    are bounded separately, and a group giving all_green ends a route with
+    the pick.
+    '''
+    profile = [0] * (depth + 1)
+    sizes = partition.sizes()
+
+    if all_green in partition:
+        profile[depth] += 1
+        sizes = sizes[partition.clues != all_green]
+
+    for size, count in zip(*np.unique(sizes, return_counts=True)):
+        levels = max_solved_by_level(int(size), max_clues)
+        profile.extend([0] * (depth + 1 + len(levels) - len(profile)))
+        for i, solved in enumerate(levels, depth + 1):
+            profile[i] += int(count) * solved
+
+    return profile
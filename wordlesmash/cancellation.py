@@ -0,0 +1,32 @@
+import multiprocessing
+
+
+class SearchCancelled(Exception):
+    ''' Raised from within the work of a search node when the search is
+    aborted, unwinding it to the search or task that runs it '''
+
+
+def check_abort(abort):
+    ''' Raise SearchCancelled if abort is specified and set '''
+    if abort is not None and abort.is_set():
+        raise SearchCancelled
+
+
+class SharedFlag:
+    '''
+    Event-like flag in shared memory. Setting and polling it are a single
+    store and load, without locks or calls to another process, so inner
+    loops can poll it. It is shared with worker processes by passing it
+    when they are started.
+    '''
+    def __init__(self, context=None):
+        self._value = (context or multiprocessing).RawValue('b', 0)
+
+    def is_set(self):
+        return bool(self._value.value)
+
+    def set(self):
+        self._value.value = 1
+
+    def clear(self):
+        self._value.value = 0
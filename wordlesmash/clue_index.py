@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .bitset import Bitset
+from .partition import Partition
+
+# Picks whose clue groups are kept, least recently used first out
+DEFAULT_MAX_PICKS = 1 << 12
+
+
+class ClueIndex:
+    '''
+    Inverted index of a clue matrix giving, for a pick and a clue, the
+    Bitset of secrets that give that clue for the pick. The groups of a
+    pick are built together from its row on first use and kept for the
+    max_picks most recently used picks, so narrowing candidates by a guess
+    history is one Bitset intersection per guess.
+    '''
+    def __init__(self, clue_matrix, max_picks=DEFAULT_MAX_PICKS):
+        self.clue_matrix = clue_matrix
+        self.max_picks = max_picks
+        self._groups = OrderedDict() # {pick: {clue: Bitset}}
+
+    def groups(self, pick):
+        ''' Return {clue: Bitset} of the secrets for each clue of pick '''
+        groups = self._groups.get(pick)
+        if groups is not None:
+            self._groups.move_to_end(pick)
+            return groups
+
+        row = np.asarray(self.clue_matrix[pick])
+        part = Partition.from_clues(np.arange(len(row)), row)
+        groups = {clue: Bitset.from_indices(secrets)
+                  for clue, secrets in part.items()}
+
+        self._groups[pick] = groups
+        if len(self._groups) > self.max_picks:
+            self._groups.popitem(last=False)
+        return groups
+
+    def secrets(self, pick, clue):
+        ''' Return the Bitset of secrets giving clue for pick '''
+        return self.groups(pick).get(clue, Bitset())
+
+    def filter(self, candidates, pick_hist, clue_hist):
+        ''' Return the Bitset of candidates giving clue_hist for pick_hist '''
+        for pick, clue in zip(pick_hist, clue_hist):
+            candidates &= self.secrets(pick, clue)
+        return candidates
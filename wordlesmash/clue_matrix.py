@@ -0,0 +1,235 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .partition import candidate_array
+from .utils import LazyMatrix
+from .wordle_game import Color
+
+# Upper bound on the number of (pick, secret) pairs computed per block, which
+# keeps peak memory to some tens of MB regardless of lexicon size.
+_BLOCK_ELEMENTS = 1 << 20
+
+
+def clue_dtype(length):
+    ''' Return the smallest unsigned dtype that holds every clue ordinal for
+    words of the specified length: uint8 up to 5 letters (243 clues) and
+    uint16 up to 10.
+    '''
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if 3 ** length <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    raise ValueError(f"Word length too large: {length}")
+
+
+def encode_words(words, alphabet=None):
+    ''' Encode a sequence of equal length words as a 2D uint8 array of letter
+    codes. Letters are numbered by their position in alphabet, which defaults
+    to the sorted set of letters used by words.
+    '''
+    words = tuple(words)
+    length = len(words[0]) if words else 0
+
+    if any(len(word) != length for word in words):
+        raise ValueError("All words must be the same length")
+
+    if alphabet is None:
+        alphabet = sorted(set(''.join(words)))
+
+    if len(alphabet) > 256:
+        raise ValueError(f"Alphabet too large for uint8 encoding: {len(alphabet)}")
+
+    letter_code = {c:i for i, c in enumerate(alphabet)}
+    codes = np.fromiter((letter_code[c] for word in words for c in word),
+                        dtype=np.uint8, count=len(words) * length)
+    return codes.reshape(len(words), length)
+
+
+def clue_block(picks, secrets, letter_counts):
+    ''' Compute clue ordinals for every pair of an encoded block of picks and
+    encoded secrets, given the per-letter counts of each secret. Returns an
+    int array of shape (len(picks), len(secrets)) matching
+    Color.ordinal(get_clue_for_secret(pick, secret)).
+    '''
+    length = picks.shape[1]
+    same_letter = picks[:, :, None] == picks[:, None, :] # (pick, pos, pos)
+    green = [picks[:, i, None] == secrets[None, :, i] for i in range(length)]
+    clues = np.zeros((picks.shape[0], secrets.shape[0]), dtype=np.int32)
+
+    for i in range(length):
+        # Unmatched occurrences in the secret of the letter at position i,
+        # i.e. the total count less the greens made with that same letter
+        available = letter_counts[picks[:, i]].astype(np.int8)
+        for k in range(length):
+            available -= green[k] & same_letter[:, k, i, None]
+
+        # Earlier non-green pick positions with the same letter claim the
+        # available letters first, left to right
+        for j in range(i):
+            available -= ~green[j] & same_letter[:, j, i, None]
+
+        yellow = ~green[i] & (available > 0)
+        clues += (green[i] * int(Color.GREEN) + yellow * int(Color.YELLOW)) * 3 ** i
+
+    return clues
+
+
+def prepare_clue_inputs(picks, secrets):
+    ''' Encode picks and secrets over their common alphabet, returning the
+    pick codes, secret codes and (letter, secret) occurrence counts used by
+    clue_block.
+    '''
+    picks = tuple(picks)
+    secrets = tuple(secrets)
+    alphabet = sorted(set(''.join(picks)) | set(''.join(secrets)))
+    pick_codes = encode_words(picks, alphabet)
+    secret_codes = encode_words(secrets, alphabet)
+
+    if picks and secrets and pick_codes.shape[1] != secret_codes.shape[1]:
+        raise ValueError("Picks and secrets must be the same length")
+
+    letter_counts = np.zeros((len(alphabet), len(secrets)), dtype=np.uint8)
+    for column in secret_codes.T:
+        letter_counts[column, np.arange(len(secrets))] += 1
+
+    return pick_codes, secret_codes, letter_counts
+
+
+def compute_clue_matrix(picks, secrets, dtype=None):
+    ''' Return a picks x secrets matrix of clue ordinals. Equivalent to calling
+    Color.ordinal(get_clue_for_secret(pick, secret)) for every pair, but
+    computed a block of picks at a time with array operations. The dtype
+    defaults to the smallest that fits the word length.
+    '''
+    pick_codes, secret_codes, letter_counts = prepare_clue_inputs(picks, secrets)
+    n_picks, n_secrets = len(pick_codes), len(secret_codes)
+
+    if dtype is None:
+        dtype = clue_dtype(pick_codes.shape[1])
+
+    clue_matrix = np.empty((n_picks, n_secrets), dtype=dtype)
+    block = max(1, _BLOCK_ELEMENTS // max(1, n_secrets))
+
+    for start in range(0, n_picks, block):
+        stop = start + block
+        clue_matrix[start:stop] = clue_block(pick_codes[start:stop],
+                                             secret_codes, letter_counts)
+
+    return clue_matrix
+
+
+class TiledClueMatrix(LazyMatrix):
+    '''
+    Clue matrix computed lazily in tiles of tile_rows picks against all
+    secrets. Tiles are computed on first access and kept in an LRU cache of
+    at most max_bytes, so lexicons too large for a dense matrix can be
+    searched without precomputing it, touching only the picks that are used.
+
+    Supports the indexing used with dense matrices: matrix[pick, secret],
+    matrix[pick], matrix[pick, secrets] and matrix[picks].
+    '''
+    def __init__(self, picks, secrets, tile_rows=256, max_bytes=1 << 28,
+                 dtype=None):
+        super().__init__(self._getitem)
+        self._pick_codes, self._secret_codes, self._letter_counts = \
+            prepare_clue_inputs(picks, secrets)
+        self.shape = (len(self._pick_codes), len(self._secret_codes))
+        self.dtype = np.dtype(dtype or clue_dtype(self._pick_codes.shape[1]))
+        self.tile_rows = tile_rows
+        tile_bytes = max(1, tile_rows * self.shape[1] * self.dtype.itemsize)
+        self.max_tiles = max(1, max_bytes // tile_bytes)
+        self._tiles = OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_tiles'] = OrderedDict() # recomputed on demand
+        del state['func']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.func = self._getitem
+
+    def __len__(self):
+        return self.shape[0]
+
+    def tile(self, t):
+        ''' Return tile t, computing it if it isn't cached '''
+        tiles = self._tiles
+
+        if t in tiles:
+            tiles.move_to_end(t)
+            return tiles[t]
+
+        start = t * self.tile_rows
+        stop = start + self.tile_rows
+        tile = clue_block(self._pick_codes[start:stop], self._secret_codes,
+                          self._letter_counts).astype(self.dtype)
+        tile.flags.writeable = False
+        tiles[t] = tile
+
+        while len(tiles) > self.max_tiles:
+            tiles.popitem(last=False)
+
+        return tile
+
+    def row(self, pick):
+        t, r = divmod(int(pick), self.tile_rows)
+        return self.tile(t)[r]
+
+    def rows(self, picks):
+        ''' Return a dense array of the rows for an array of picks '''
+        picks = np.asarray(picks, dtype=np.intp).reshape(-1)
+        out = np.empty((len(picks), self.shape[1]), dtype=self.dtype)
+        tile_idx, row_idx = np.divmod(picks, self.tile_rows)
+
+        for t in np.unique(tile_idx):
+            mask = tile_idx == t
+            out[mask] = self.tile(int(t))[row_idx[mask]]
+
+        return out
+
+    def _getitem(self, index):
+        pick, secret = index if isinstance(index, tuple) else (index, slice(None))
+
+        if isinstance(pick, (int, np.integer)):
+            return self.row(pick)[secret]
+
+        picks = np.arange(self.shape[0])[pick]
+        return self.rows(picks)[:, secret]
+
+
+class CandidateView:
+    '''
+    The clue matrix columns for a search node's candidates, gathered once into
+    a contiguous secret-major block of shape (len(candidates), n_picks). Every
+    pick's clues over the node's candidates are then read from one small
+    block instead of scattered elements of the full matrix, and views for the
+    node's children are gathered from it rather than from the full matrix.
+
+    Gathering is fastest from a secret-major (Fortran ordered) clue matrix,
+    where each candidate's column is contiguous.
+    '''
+    def __init__(self, clues, candidates):
+        self.clues = clues
+        self.candidates = candidates
+        self.secrets = tuple(candidates.tolist())
+
+    @classmethod
+    def from_matrix(cls, clue_matrix, candidates):
+        ''' Gather the view for a collection of candidates, in sorted order '''
+        candidates = candidate_array(candidates)
+        return cls(np.asarray(clue_matrix).T[candidates], candidates)
+
+    def child(self, candidates):
+        ''' Gather the view for a subset of this view's candidates '''
+        candidates = candidate_array(candidates)
+        return CandidateView(self.clues[np.searchsorted(self.candidates, candidates)],
+                             candidates)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def row(self, pick):
+        ''' Return the clues for pick over the view's candidates '''
+        return self.clues[:, pick]
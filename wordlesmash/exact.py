@@ -0,0 +1,170 @@
+import numpy as np
+
+from .bounds import max_solved_by_level
+from .cancellation import check_abort
+from .partition import first_unique_rows
+
+# Candidate sets are bitsets in a uint64, which bounds the candidates solved
+MAX_CANDIDATES = 64
+
+# Subsets solved between polls of the abort signal
+_ABORT_INTERVAL = 64
+
+
+def profile_key(profile):
+    ''' Sort key ordering depth profiles as depth_counts_cmp does '''
+    end = len(profile)
+    while end and not profile[end - 1]:
+        end -= 1
+    return (end, tuple(profile[end - 1::-1]) if end else ())
+
+
+def add_into(total, profile, shift=0):
+    ''' Add profile, shifted down shift levels, into the list total '''
+    total.extend([0] * (shift + len(profile) - len(total)))
+    for i, n in enumerate(profile, shift):
+        total[i] += n
+
+
+class ExactSolver:
+    '''
+    Exhaustive branch and bound search for the best route set for a small
+    set of candidates, using every pick. Subsets of the candidates are
+    bitsets, and the best profile of each subset searched is memoized.
+
+    Profiles are relative to the node solved: profile[0] counts the routes
+    ending with the node's pick. The best profile of a pick is the sum of
+    the best profiles of its clue groups, since the order of profiles is
+    compatible with addition, and picks are tried in order of the lower
+    bound of their profile so the search can stop at the first pick whose
+    bound can't beat the best found.
+    '''
+    def __init__(self, block, picks, candidates, all_green, abort=None):
+        ''' block is the (candidates x picks) array of clues. If abort is
+        set while solving, SearchCancelled is raised. '''
+        if len(candidates) > MAX_CANDIDATES:
+            raise ValueError(f"At most {MAX_CANDIDATES} candidates can be solved exactly")
+
+        self.block = np.asarray(block)
+        self.picks = np.asarray(picks, dtype=np.intp)
+        self.candidates = np.asarray(candidates, dtype=np.intp)
+        self.all_green = all_green
+        self.full = (1 << len(candidates)) - 1
+        self._bits = np.left_shift(np.uint64(1), np.arange(len(candidates), dtype=np.uint64))
+        self._best = {} # {bitset: (profile, pick, clues, groups)}
+        self.abort = abort
+
+    def members(self, bitset):
+        return [i for i in range(bitset.bit_length()) if bitset >> i & 1]
+
+    def splits(self, members):
+        '''
+        Return the distinct ways the picks split the members: the index of
+        the first pick of each, and for each its clues, group bitsets and
+        group sizes, grouped by pick.
+        '''
+        sub = self.block[members].T # (picks x members)
+        firsts = first_unique_rows(sub)
+        sub = sub[firsts]
+
+        order = np.argsort(sub, axis=1, kind='stable')
+        clues = np.take_along_axis(sub, order, axis=1)
+        bits = self._bits[np.asarray(members)][order]
+
+        # Groups start where the clue changes within each pick's row
+        starts = np.ones(clues.shape, dtype=bool)
+        starts[:, 1:] = clues[:, 1:] != clues[:, :-1]
+        flat_starts = starts.ravel().nonzero()[0]
+        groups = np.bitwise_or.reduceat(bits.ravel(), flat_starts)
+        sizes = np.diff(np.append(flat_starts, clues.size))
+        n_groups = starts.sum(axis=1)
+
+        return firsts, clues.ravel()[flat_starts], groups, sizes, n_groups
+
+    def solve(self, bitset=None):
+        ''' Return the best profile for the candidates in bitset, or None if
+        no pick splits them '''
+        bitset = self.full if bitset is None else bitset
+        best = self._best.get(bitset)
+        if best is not None:
+            return best[0]
+
+        if not len(self._best) % _ABORT_INTERVAL:
+            check_abort(self.abort)
+
+        members = self.members(bitset)
+        if len(members) == 1:
+            self._best[bitset] = ((1,), int(self.candidates[members[0]]),
+                                  [self.all_green], [bitset])
+            return (1,)
+
+        firsts, clues, groups, sizes, n_groups = self.splits(members)
+        max_clues = int(n_groups.max())
+
+        # Lower bound the profile of each pick by summing the bounds of its
+        # clue groups, looked up by size, over each pick's groups
+        levels = [max_solved_by_level(size, max_clues) for size in range(1, len(members) + 1)]
+        table = np.zeros((len(members) + 1, 1 + len(levels[-1])), dtype=np.intp)
+        for size, solved in enumerate(levels, 1):
+            table[size, 1:1 + len(solved)] = solved
+
+        green = clues == self.all_green
+        rows = table[sizes]
+        rows[green] = 0
+        rows[green, 0] = 1
+        offsets = np.concatenate(([0], np.cumsum(n_groups)))
+        bounds = np.add.reduceat(rows, offsets[:-1], axis=0)
+
+        # Picks are tried in order of their bound, as depth_counts_cmp
+        # orders profiles, and then of pick
+        picks = self.picks[firsts]
+        splits = (n_groups > 1) | np.add.reduceat(green, offsets[:-1]).astype(bool)
+        order = np.lexsort((picks, *bounds.T))
+        order = order[splits[order]]
+
+        offsets, clues, groups, sizes = offsets.tolist(), clues.tolist(), groups.tolist(), sizes.tolist()
+        best_key, best = None, None
+
+        for i in order.tolist():
+            bound = bounds[i].tolist()
+            if best_key is not None and profile_key(bound) >= best_key:
+                break # no remaining pick can do better
+
+            # Replace the bound of each group with its best profile, giving
+            # up once the pick can't beat the best
+            a, b = offsets[i], offsets[i + 1]
+            total = bound
+            for clue, group, size in zip(clues[a:b], groups[a:b], sizes[a:b]):
+                if clue != self.all_green and size > 1:
+                    profile = self.solve(group)
+                    if profile is None: # no pick splits the group
+                        break
+                    add_into(total, profile, 1)
+                    add_into(total, [-n for n in levels[size - 1]], 1)
+                    if best_key is not None and profile_key(total) >= best_key:
+                        break
+            else:
+                best_key = profile_key(total)
+                best = (tuple(total[:best_key[0]]), int(picks[i]), clues[a:b], groups[a:b])
+
+        self._best[bitset] = best or (None, None, None, None)
+        return self._best[bitset][0]
+
+    def routes(self, bitset=None, pick_hist=()):
+        ''' Return the routes of the best route set for bitset, prefixed by
+        pick_hist, or None if there is none '''
+        bitset = self.full if bitset is None else bitset
+        if self.solve(bitset) is None:
+            return None
+        _, pick, clues, groups = self._best[bitset]
+        new_pick_hist = pick_hist + (pick,)
+
+        routes = []
+        for clue, group in zip(clues, groups):
+            if clue == self.all_green:
+                routes.append(new_pick_hist)
+            elif group & (group - 1):
+                routes.extend(self.routes(group, new_pick_hist))
+            else:
+                routes.append(new_pick_hist + (int(self.candidates[group.bit_length() - 1]),))
+        return routes
@@ -19,16 +19,19 @@ class FilterCode:
     char_bits_map = {c:tuple(b == '1' for b in f'{i:05b}') for i, c in enumerate(domain.keys())}
     bits_char_map = {v:k for k, v in char_bits_map.items()}
 
-    def __init__(self, blacklist=None, known_chars=None, viable=None, confirmed=None):
-        self.bits = np.zeros(76, dtype=bool)
-        # Bit partitioning
-        # 25, 25, 26: 76
-        self.char_bits = self.bits[0:25].reshape((5, 5)) # Bits 0-17: Known letters (18 bits)
-        self.presence = self.bits[25:50].reshape((5, 5)) # Bits 18-37: possible presense bitfield (25 bits, 5 letters)
-        self.presence[:,:] = np.ones((5, 5), dtype=bool) # set presence to all ones
+    def __init__(self, blacklist=None, known_chars=None, viable=None, confirmed=None,
+                 length=5):
+        self.length = length
+        n = length
+        # Bit partitioning scales with the word length n:
+        # 5n, n*n, 26: 76 for n = 5
+        self.bits = np.zeros(5 * n + n * n + 26, dtype=bool)
+        self.char_bits = self.bits[0:5 * n].reshape((n, 5)) # Known letters (5 bits each)
+        self.presence = self.bits[5 * n:5 * n + n * n].reshape((n, n)) # possible presense bitfield (n bits, n letters)
+        self.presence[:,:] = np.ones((n, n), dtype=bool) # set presence to all ones
         # axis 0 is asociated w/ character, axis 1 is the column
 
-        self.blacklist = self.bits[50:76]                # Bits 38-63: Blacklist (26 bits)
+        self.blacklist = self.bits[5 * n + n * n:]      # Blacklist (26 bits)
 
         # Initialize with provided values
         if known_chars is not None:
@@ -70,7 +73,8 @@ class FilterCode:
     def from_guess_filter(cls, guess):
 
         blacklist = {k:k in guess.blacklist for k in cls.alphabet}
-        return cls(blacklist, guess.letters, guess.viable, guess.confirmed)
+        return cls(blacklist, guess.letters, guess.viable, guess.confirmed,
+                   guess.length)
 
     # def to_guess_filter(self):
 
@@ -107,7 +111,7 @@ class FilterCode:
     #     return guess
 
     def is_fully_known(self):
-        """Check if all 5 letters are known (multiplicity of 5)."""
+        """Check if all letters are known (multiplicity of the word length)."""
         # return sum(1 for c in self.unpack_known_chars() if c is not None) == 5
         # return sum(1 for c in filter(None, self.unpack_known_chars())) == 5
         return None not in self.unpack_known_chars()
@@ -116,7 +120,7 @@ class FilterCode:
         """Set known letters using combinatorial ranking."""
 
         letters = [item for c, n in charset.items() for item in [c] * n]
-        letters += [None] * (5 - len(letters)) # add Nones to pad to length 5
+        letters += [None] * (self.length - len(letters)) # add Nones to pad to length
         letters.sort(key=self.char_ord.get)
 
         # charset = sorted(charset, key=self.char_ord.get)
@@ -240,8 +244,8 @@ class FilterCode:
         # letters.sort(key=self.char_ord.get)
 
         # XXX maybe unecessary
-        if letters.total() < 5:
-            letters[None] = (5 - letters.total())
+        if letters.total() < self.length:
+            letters[None] = (self.length - letters.total())
         # else:
         #     del letters[None]
             
@@ -342,55 +346,42 @@ class FilterCode:
         # Validate inputs
         if letter not in self.domain:
             raise ValueError(f"Letter must be in {self.alphabet[:-1]}")
-        if slot is not None and (not isinstance(slot, int) or slot < 0 or slot > 4):
-            raise ValueError("Slot must be an integer between 0 and 4")
+        if slot is not None and (not isinstance(slot, int) or slot < 0 or slot >= self.length):
+            raise ValueError(f"Slot must be an integer between 0 and {self.length - 1}")
         if green and slot is None:
             raise ValueError("Slot is required for green letters")
         if not green and slot is None and letter not in self.unpack_known_chars():
             raise ValueError("Slot is required for new yellow letters")
 
         # Get current known_chars and presence
-        known_chars = list(self.unpack_known_chars())
-        current_mask = self.get_presence()
+        known_chars = self.unpack_known_chars()
         num_known = sum(1 for c in known_chars if c is not None)
 
-        # If already 5 letters, no action needed
-        if num_known >= 5:
+        # If all letters are already known, no action needed
+        if num_known >= self.length:
             return
 
-        # Store current sorted positions and masks
-        old_positions = self._get_sorted_positions(known_chars)
-        old_masks = {p[1]: current_mask[i] for p in old_positions for i in range(len(current_mask)) if i == p[1]}
-
-        # Add the new letter
-        if None in known_chars:
-            known_chars[known_chars.index(None)] = letter
-        self.set_known_chars(known_chars)
-
-        # Get new sorted positions
-        new_positions = self._get_sorted_positions(known_chars)
-        new_letter_index = next(i for c, i in new_positions if c == letter)
-
-        # Shift masks to align with new sorted positions
-        new_mask = np.zeros((5, 5), dtype=bool)
-        for c, new_idx in new_positions:
-            if (c, new_idx) == (letter, new_letter_index):
-                # Set mask for the new letter
-                if green:
-                    new_mask[new_idx] = [True] * 5
-                    new_mask[new_idx, slot] = False  # Only slot is allowed
-                else:
-                    new_mask[new_idx, slot] = True  # Slot is forbidden
-            else:
-                # Copy old mask to new position
-                old_idx = next(i for cc, i in old_positions if cc == c)
-                new_mask[new_idx] = old_masks.get(old_idx, np.zeros(5, dtype=bool))
-
-        # Update presence or fifth_letter_presence
-        if num_known == 4:  # Adding 5th letter
-            self.fifth_letter_presence[:] = new_mask[4]
-            self.blacklist[5:] = False  # Clear remaining blacklist
-        self.presence[:] = new_mask[:4].flatten()
+        # Rows of presence follow the sorted known letters, unknowns last.
+        # The new letter takes the row of an unknown letter.
+        rows = [[c, row.copy()] for c, row in zip(known_chars, self.presence)]
+        new_row = rows.pop(known_chars.index(None))
+        new_row[0] = letter
+
+        if green:
+            # A column viable for only one letter is its green
+            for _, row in rows:
+                row[slot] = False
+            new_row[1][slot] = True
+        elif slot is not None:
+            new_row[1][slot] = False  # Slot is forbidden
+
+        rows.append(new_row)
+        rows.sort(key=lambda item: self.char_ord[item[0]])
+        self.set_known_chars(Counter(c for c, _ in rows if c is not None))
+        self.presence[:] = [row for _, row in rows]
+
+        if num_known == self.length - 1:  # Adding last letter
+            self.blacklist[:] = False  # Unused once every letter is known
 
 
     def construct_guess_filter(self):
@@ -402,15 +393,16 @@ class FilterCode:
         return np.packbits(bits).tobytes()
 
 
-    # XXX need to check if this works correctly
     def unpack_bytes(self, byte_str):
-        alphabet = (*ascii_uppercase, None)
-        # ord_char = {f'{i:0{5}b}':c for i, c in enumerate(alphabet)}
-        bit_str = ''.join(f'{int.from_bytes(byte):0{8}b}' for byte in byte_str)
-
-        blacklist = [bit == '1' for bit in bit_str[-76:-50]]
-        hit_chars = generate_multiset(int(bit_str[-43:-25], 2), alphabet)
-        hit_mask = [[bit == '1' for bit in b5] for b5 in batched(bit_str[-25:], 5)]
+        """Unpack the known letters and presence rows of a code packed by
+        pack_to_bytes with the same word length."""
+        bit_str = ''.join(f'{byte:08b}' for byte in byte_str)
+
+        # Fields in the order of self.bits, after the padding
+        n = self.length
+        bits = [bit == '1' for bit in bit_str[-len(self.bits):]]
+        hit_chars = [self.bits_char_map[group] for group in batched(bits[:5 * n], 5)]
+        hit_mask = [list(row) for row in batched(bits[5 * n:5 * n + n * n], n)]
 
         return bit_str, hit_chars, hit_mask
 
@@ -49,6 +49,9 @@ class MainWordLeSmashWindow(QMainWindow, Ui_MainWindow):
 
     def resetGuessManager(self):
         dt = self.profile_manager.getDecisionTrees()
+        self.guessDisplay.setWordLength(self.profile_manager.getWordLength())
+        if getattr(self, 'guess', None) is not None:
+            self.guess.close() # its workers would otherwise idle until exit
         self.guess = DecisionTreeGuessManager(
             self.profile_manager.getPicks(),
             self.profile_manager.getCandidates(),
@@ -0,0 +1,389 @@
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from textwrap import dedent
+from traceback import format_exception_only
+
+import numpy as np
+
+from .clue_matrix import compute_clue_matrix
+from .pick_analysis import PickAnalysis
+
+try:
+    import fcntl
+except ImportError: # not available on Windows, where locking is skipped
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def write_atomic(path, write):
+    '''
+    Write a file by calling write with a temporary file in the same
+    directory, then moving it over path, so readers never see a partial
+    file.
+    '''
+    # Created with the mode a plain open would give the file, the umask
+    # applied, rather than the owner-only mode of temporary files
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        tmp_path = Path(path).parent / f'.{secrets.token_hex(8)}.tmp'
+        try:
+            fd = os.open(tmp_path, flags, 0o666)
+            break
+        except FileExistsError:
+            continue
+
+    with os.fdopen(fd, 'wb') as f:
+        try:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+
+    os.replace(tmp_path, path)
+
+
+def remap_indices(words, old_words):
+    '''
+    Return index arrays of the words shared with old_words, their indices in
+    old_words, and the indices of the words that are not shared.
+    '''
+    old_idx = {w:i for i, w in enumerate(old_words)}
+    lookup = np.array([old_idx.get(w, -1) for w in words], dtype=np.intp)
+    shared = np.flatnonzero(lookup >= 0)
+    added = np.flatnonzero(lookup < 0)
+    return shared, lookup[shared], added
+
+
+class MatrixCache:
+    '''
+    Manages the clue matrices cached on disk. Each word_matrix_*.npy file has
+    a JSON sidecar with its word lists and metadata. Writes are atomic, an
+    advisory lock keeps concurrent processes from computing the same matrix
+    twice, and the least recently used matrices are evicted once the cache
+    exceeds max_bytes.
+    '''
+    pattern = 'word_matrix_*.npy'
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def sidecar_path(matrix_path):
+        ''' Path of the file recording the word lists of a cached matrix '''
+        return Path(matrix_path).with_suffix('.json')
+
+    @staticmethod
+    def lock_path(matrix_path):
+        return Path(matrix_path).with_suffix('.lock')
+
+    @staticmethod
+    def analysis_path(matrix_path):
+        ''' Path of the PickAnalysis of a cached matrix '''
+        return Path(matrix_path).with_suffix('.picks.npz')
+
+    @staticmethod
+    def order_key(picks):
+        ''' Return a hash of the order of picks, which index an analysis '''
+        data = '\n'.join(picks).encode('utf-8')
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def path(self, filename):
+        return self.cache_dir / filename
+
+    def load(self, filename):
+        '''
+        Return the cached matrix with the specified filename or None if it is
+        not cached. Raises OSError, ValueError or EOFError if it is unreadable.
+        '''
+        matrix_path = self.path(filename)
+
+        try:
+            clue_matrix = np.load(matrix_path)
+        except FileNotFoundError:
+            return None
+
+        self.touch(matrix_path)
+        return clue_matrix
+
+    @staticmethod
+    def touch(matrix_path):
+        ''' Mark a matrix as recently used '''
+        try:
+            os.utime(matrix_path)
+        except OSError:
+            pass
+
+    def save(self, filename, clue_matrix, picks, candidates):
+        '''
+        Atomically save a clue matrix along with a sidecar listing the picks
+        and candidates that index its rows and columns, then evict the least
+        recently used matrices if the cache is over budget.
+        '''
+        matrix_path = self.path(filename)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        metadata = {
+            'n_picks': len(picks),
+            'n_candidates': len(candidates),
+            'word_length': len(next(iter(picks), '')),
+            'dtype': clue_matrix.dtype.str,
+            'created': time.time(),
+            'picks': list(picks),
+            'candidates': list(candidates),
+        }
+
+        # The sidecar is written last, as matrices without one are ignored
+        write_atomic(matrix_path, lambda f: np.save(f, clue_matrix))
+        write_atomic(self.sidecar_path(matrix_path),
+                           lambda f: f.write(json.dumps(metadata).encode('utf-8')))
+
+        self.evict(keep=(matrix_path,))
+
+    def load_analysis(self, filename, picks):
+        '''
+        Return the PickAnalysis saved for the matrix with the specified
+        filename and row order of picks, or None if there is none.
+        Unreadable analyses are logged and ignored.
+        '''
+        try:
+            with np.load(self.analysis_path(self.path(filename))) as data:
+                if str(data['order']) != self.order_key(picks):
+                    return None
+                return PickAnalysis(data['classes'], data['dominators'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, EOFError) as e:
+            logger.warning(dedent(f"""
+                           Warning: Unable to read pick analysis.
+                           {format_exception_only(e)}""").strip())
+            return None
+
+    def save_analysis(self, filename, analysis, picks):
+        ''' Atomically save the PickAnalysis of a matrix whose rows are
+        picks, in order '''
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.analysis_path(self.path(filename)),
+                           lambda f: np.savez(f, classes=analysis.classes,
+                                              dominators=analysis.dominators,
+                                              order=np.array(self.order_key(picks))))
+
+    @contextmanager
+    def lock(self, filename):
+        '''
+        Hold an exclusive advisory lock for computing the specified matrix.
+        Other processes block here until it is released.
+        '''
+        if fcntl is None:
+            yield
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            f = open(self.lock_path(self.path(filename)), 'a')
+        except OSError as e:
+            logger.warning(dedent(f"""
+                           Warning: Unable to lock matrix data.
+                           {format_exception_only(e)}""").strip())
+            yield
+            return
+
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read_metadata(self, matrix_path):
+        with open(self.sidecar_path(matrix_path)) as f:
+            return json.load(f)
+
+    def entries(self):
+        '''
+        Generate (matrix_path, picks, candidates) for every cached matrix
+        that has a readable sidecar.
+        '''
+        for matrix_path in sorted(self.cache_dir.glob(self.pattern)):
+            try:
+                metadata = self.read_metadata(matrix_path)
+                yield (matrix_path, tuple(metadata['picks']),
+                       tuple(metadata['candidates']))
+            except (OSError, ValueError, KeyError):
+                continue
+
+    def evict(self, keep=()):
+        '''
+        Delete the least recently used matrices until the cache fits within
+        max_bytes. Matrices in keep are never evicted.
+        '''
+        if self.max_bytes is None:
+            return
+
+        usage = []
+        total = 0
+        for matrix_path in self.cache_dir.glob(self.pattern):
+            related = (matrix_path, self.sidecar_path(matrix_path),
+                       self.lock_path(matrix_path), self.analysis_path(matrix_path))
+            try:
+                size = sum(p.stat().st_size for p in related if p.exists())
+                used = matrix_path.stat().st_mtime
+            except OSError:
+                continue
+            total += size
+            if matrix_path not in keep:
+                usage.append((used, size, related))
+
+        for used, size, related in sorted(usage):
+            if total <= self.max_bytes:
+                break
+            logger.debug(f"Evicting cached matrix: {related[0].name}")
+            for path in related:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(dedent(f"""
+                                   Warning: Unable to evict matrix data.
+                                   {format_exception_only(e)}""").strip())
+            total -= size
+
+    def find_nearest(self, picks, candidates):
+        '''
+        Return (matrix_path, picks, candidates) of the cached matrix requiring
+        the fewest new clue computations to derive the matrix for the
+        specified picks and candidates, or None if none shares any words.
+        '''
+        picks = frozenset(picks)
+        candidates = frozenset(candidates)
+        best = None
+        best_cost = len(picks) * len(candidates)
+
+        for matrix_path, old_picks, old_candidates in self.entries():
+            known_picks = len(picks.intersection(old_picks))
+            known_candidates = len(candidates.intersection(old_candidates))
+            # new rows against every candidate, plus new columns for known rows
+            cost = ((len(picks) - known_picks) * len(candidates) +
+                    known_picks * (len(candidates) - known_candidates))
+
+            if cost < best_cost:
+                best = (matrix_path, old_picks, old_candidates)
+                best_cost = cost
+
+        return best
+
+    def find_superset(self, picks, candidates):
+        '''
+        Return (matrix_path, picks, candidates) of the smallest cached matrix
+        whose picks and candidates include all of those specified, or None.
+        '''
+        picks = frozenset(picks)
+        candidates = frozenset(candidates)
+        best = None
+        best_size = float('inf')
+
+        for matrix_path, old_picks, old_candidates in self.entries():
+            size = len(old_picks) * len(old_candidates)
+
+            if (size < best_size and picks.issubset(old_picks) and
+                candidates.issubset(old_candidates)):
+                best = (matrix_path, old_picks, old_candidates)
+                best_size = size
+
+        return best
+
+    def load_mmap(self, matrix_path, picks, candidates):
+        '''
+        Memory map a cached matrix read-only, returning None if it can't be
+        read or its shape doesn't match its word lists.
+        '''
+        try:
+            matrix = np.load(matrix_path, mmap_mode='r')
+        except (OSError, ValueError, EOFError) as e:
+            logger.warning(dedent(f"""
+                           Warning: Unable to read matrix data.
+                           {format_exception_only(e)}""").strip())
+            return None
+
+        if matrix.shape != (len(picks), len(candidates)):
+            logger.warning(f"Cached matrix does not match its word lists: {matrix_path}")
+            return None
+
+        self.touch(matrix_path)
+        return matrix
+
+    def extract(self, picks, candidates):
+        '''
+        Extract the clue matrix for picks x candidates from a cached matrix
+        covering a superset of both word lists. Only the needed rows and
+        columns are read through a memory map, and nothing new is written to
+        the cache. Returns None if no such matrix is cached.
+        '''
+        superset = self.find_superset(picks, candidates)
+
+        if superset is None:
+            return None
+
+        matrix_path, old_picks, old_candidates = superset
+        old_matrix = self.load_mmap(matrix_path, old_picks, old_candidates)
+
+        if old_matrix is None:
+            return None
+
+        _, old_rows, _ = remap_indices(picks, old_picks)
+        _, old_cols, _ = remap_indices(candidates, old_candidates)
+        logger.debug(f"Extracting matrix from {matrix_path.name}")
+
+        return old_matrix[old_rows][:, old_cols]
+
+    def derive(self, picks, candidates):
+        '''
+        Derive the clue matrix for picks x candidates from the nearest cached
+        matrix: rows and columns for shared words are copied over (dropping
+        those for removed words) and only the added words are computed.
+        Returns None if no suitable matrix is cached.
+        '''
+        picks = tuple(picks)
+        candidates = tuple(candidates)
+        nearest = self.find_nearest(picks, candidates)
+
+        if nearest is None:
+            return None
+
+        matrix_path, old_picks, old_candidates = nearest
+        old_matrix = self.load_mmap(matrix_path, old_picks, old_candidates)
+
+        if old_matrix is None:
+            return None
+
+        rows, old_rows, added_rows = remap_indices(picks, old_picks)
+        cols, old_cols, added_cols = remap_indices(candidates, old_candidates)
+        logger.debug(f"Deriving matrix from {matrix_path.name}: "
+                     f"{len(added_rows)} new picks, {len(added_cols)} new candidates")
+
+        clue_matrix = np.empty((len(picks), len(candidates)), dtype=old_matrix.dtype)
+        clue_matrix[np.ix_(rows, cols)] = old_matrix[np.ix_(old_rows, old_cols)]
+
+        if len(added_rows):
+            clue_matrix[added_rows] = compute_clue_matrix(
+                [picks[i] for i in added_rows], candidates, dtype=clue_matrix.dtype)
+
+        if len(added_cols) and len(rows):
+            clue_matrix[np.ix_(rows, added_cols)] = compute_clue_matrix(
+                [picks[i] for i in rows], [candidates[j] for j in added_cols],
+                dtype=clue_matrix.dtype)
+
+        return clue_matrix
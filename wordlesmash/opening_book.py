@@ -0,0 +1,226 @@
+import hashlib
+import logging
+import os
+import sys
+from pathlib import Path
+from textwrap import dedent
+from traceback import format_exception_only
+
+import numpy as np
+
+from .bitset import Bitset
+from .matrix_cache import write_atomic
+from .partition import best_picks
+from .transposition import candidate_set_key
+
+logger = logging.getLogger(__name__)
+
+# Openers whose second level responses are booked
+DEFAULT_OPENERS = 10
+
+# Best picks booked for each node, which bounds the branching a booked node
+# can serve without being ranked
+DEFAULT_TOP_PICKS = 32
+
+# Levels of the search served from the book: the root and its responses
+MAX_DEPTH = 2
+
+# Stages of the search that rank a node's picks
+SEARCH, NODE = b's', b'n'
+
+# Books loaded by this process, by path, along with the stat they were read
+# with so a rebuilt book is reloaded
+_loaded = {}
+
+
+def node_key(stage, candidates, picks):
+    ''' Return the key of a node's ranking, given its candidates as a sorted
+    int array and its picks as a Bitset '''
+    data = picks.bits.to_bytes((picks.bits.bit_length() + 7) // 8, 'little')
+    return hashlib.blake2b(stage + candidate_set_key(candidates) + data,
+                           digest_size=16).digest()
+
+
+class BookEntry:
+    '''
+    What a search needs from the ranking of a node's picks: the Bitset of
+    picks left after folding equivalent picks, the most clues any of them
+    gives, the number of candidates ranked as picks, which selects the
+    branch rule, and the best picks in the order get_top_picks takes them.
+    perfect is set if the first pick splits the candidates perfectly, and
+    complete if top holds every valid pick.
+    '''
+    __slots__ = ('picks', 'max_clues', 'n_candidates', 'perfect', 'complete', 'top')
+
+    def __init__(self, picks, max_clues, n_candidates=0, perfect=False,
+                 complete=True, top=()):
+        self.picks = picks
+        self.max_clues = max_clues
+        self.n_candidates = n_candidates
+        self.perfect = perfect
+        self.complete = complete
+        self.top = tuple(top)
+
+    @classmethod
+    def from_rankings(cls, candidate_rank, pick_rank, picks, max_clues,
+                      n_top=DEFAULT_TOP_PICKS):
+        ''' Return the entry of a node from the PickRankings of its candidates
+        and strategic picks, booking its n_top best picks '''
+        for ranking in (candidate_rank, pick_rank):
+            i = ranking.first_perfect()
+            if i is not None:
+                return cls(picks, max_clues, len(candidate_rank), True, True,
+                           [int(ranking.picks[i])])
+
+        best = best_picks((candidate_rank, pick_rank), n_top)
+        return cls(picks, max_clues, len(candidate_rank), False,
+                   len(best) < n_top,
+                   [int(ranking.picks[i]) for ranking, i in best])
+
+    def top_picks(self, options, final_branch=False):
+        ''' Return the picks to branch on, as get_top_picks selects them, or
+        None if the book doesn't hold enough of them '''
+        if self.perfect:
+            return list(self.top)
+        elif final_branch:
+            return []
+        elif options >= len(self.top):
+            return list(self.top) if self.complete else None
+        return list(self.top[:options])
+
+
+class OpeningBook:
+    '''
+    Rankings of the nodes at the first levels of a search, computed offline
+    by WordleTree.build_opening_book, so a search over the same clue matrix
+    branches there without ranking every pick. Entries are keyed by the
+    stage of the search, the node's candidates and its picks, so a book
+    only serves the nodes it was built for.
+    '''
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, stage, candidates, picks, entry):
+        self.entries[node_key(stage, candidates, picks)] = entry
+
+    def lookup(self, stage, candidates, picks):
+        ''' Return the BookEntry of a node, or None if it isn't booked '''
+        return self.entries.get(node_key(stage, candidates, picks))
+
+    def save(self, path):
+        ''' Atomically save the book as a binary npz file '''
+        path = Path(path)
+        entries = list(self.entries.values())
+        picks = [entry.picks.bits.to_bytes((entry.picks.bits.bit_length() + 7) // 8,
+                                           'little') for entry in entries]
+        arrays = dict(
+            keys=np.frombuffer(b''.join(self.entries), dtype=np.uint8).reshape(-1, 16),
+            max_clues=np.array([entry.max_clues for entry in entries], dtype=np.int32),
+            n_candidates=np.array([entry.n_candidates for entry in entries], dtype=np.int32),
+            perfect=np.array([entry.perfect for entry in entries], dtype=bool),
+            complete=np.array([entry.complete for entry in entries], dtype=bool),
+            top_offsets=np.cumsum([0, *(len(entry.top) for entry in entries)]),
+            top=np.array([pick for entry in entries for pick in entry.top], dtype=np.int32),
+            pick_offsets=np.cumsum([0, *map(len, picks)]),
+            picks=np.frombuffer(b''.join(picks), dtype=np.uint8),
+        )
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(path, lambda f: np.savez(f, **arrays))
+
+    @classmethod
+    def load(cls, path):
+        ''' Return the book saved at path. Raises OSError or ValueError if it
+        is missing or unreadable. '''
+        with np.load(path) as data:
+            keys = data['keys'].tobytes()
+            top_offsets = data['top_offsets'].tolist()
+            top = data['top'].tolist()
+            pick_offsets = data['pick_offsets'].tolist()
+            picks = data['picks'].tobytes()
+            columns = zip(data['max_clues'].tolist(), data['n_candidates'].tolist(),
+                          data['perfect'].tolist(), data['complete'].tolist())
+
+            entries = {}
+            for i, (max_clues, n_candidates, perfect, complete) in enumerate(columns):
+                bits = int.from_bytes(picks[pick_offsets[i]:pick_offsets[i + 1]], 'little')
+                entries[keys[16 * i:16 * (i + 1)]] = BookEntry(
+                    Bitset(bits), max_clues, n_candidates, perfect, complete,
+                    top[top_offsets[i]:top_offsets[i + 1]])
+
+        return cls(entries)
+
+
+def load_book(path):
+    '''
+    Return the book saved at path, loading it once per process, or None if
+    there is none. Unreadable books are logged and ignored.
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    version = (stat.st_mtime_ns, stat.st_size)
+    loaded = _loaded.get(path)
+    if loaded is not None and loaded[0] == version:
+        return loaded[1]
+
+    try:
+        book = OpeningBook.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(dedent(f"""
+                       Warning: Unable to read opening book.
+                       {format_exception_only(e)}""").strip())
+        book = None
+
+    _loaded[path] = (version, book)
+    return book
+
+
+def main(argv=None):
+    '''
+    Build the opening book of a game's word lists in the app's cache
+    directory. The lists are read as the app reads a profile's, so the book
+    serves the searches of profiles with the same lists and word length.
+    '''
+    from argparse import ArgumentParser
+    from importlib.resources import files
+    from .utils import load_word_list
+    from .wordle_tree import WordleTree # imports this module
+
+    words_path = files('wordlesmash.words')
+    parser = ArgumentParser(prog='python -m wordlesmash.opening_book',
+                            description="Build the opening book of a clue matrix")
+    parser.add_argument("cache_dir", help="Cache directory of the app")
+    parser.add_argument("-c", "--candidates", default=words_path / 'wordle_candidates.txt',
+                        help="Word list of the possible secrets")
+    parser.add_argument("-p", "--picks", default=words_path / 'wordle_picks.txt',
+                        help="Word list of the allowed guesses")
+    parser.add_argument("-l", "--length", type=int, default=5, help="Word length")
+    parser.add_argument("--openers", type=int, default=DEFAULT_OPENERS,
+                        help="Openers whose responses are booked")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_PICKS,
+                        help="Best picks booked for each node")
+    args = parser.parse_args(argv)
+
+    def read_words(path):
+        return tuple(sorted({word for word in load_word_list(path)
+                             if len(word) == args.length}))
+
+    tree = WordleTree(read_words(args.candidates), read_words(args.picks),
+                      cache_path=args.cache_dir)
+    try:
+        book = tree.build_opening_book(args.openers, args.top)
+    finally:
+        tree.close()
+
+    print(f"Booked {len(book)} nodes in {tree.opening_book_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+import numpy as np
+
+from .bitset import Bitset
+
+# Upper bound on the elements counted at once when building histograms, which
+# bounds the memory used for labels at large nodes
+_HISTOGRAM_ELEMENTS = 1 << 22
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def candidate_array(candidates):
+    ''' Return a collection of candidate indices as a sorted int array '''
+    if isinstance(candidates, Bitset):
+        return candidates.indices()
+    elif isinstance(candidates, np.ndarray):
+        return np.sort(candidates.astype(np.intp, copy=False))
+    return np.sort(np.fromiter(candidates, dtype=np.intp))
+
+
+class Partition:
+    '''
+    Candidates partitioned by the clue they give for a pick, stored CSR style:
+    order holds the candidate indices grouped by clue, and the group for
+    clues[i] is order[offsets[i]:offsets[i + 1]]. Clues are sorted, as are
+    the candidates within each group.
+
+    Supports the read-only interface of a {clue: candidates} dict, with each
+    group of candidates a slice of order.
+    '''
+    __slots__ = ('clues', 'offsets', 'order')
+
+    def __init__(self, clues, offsets, order):
+        self.clues = clues
+        self.offsets = offsets
+        self.order = order
+
+    @classmethod
+    def from_clues(cls, candidates, row):
+        '''
+        Partition a sorted int array of candidates given their clues for a
+        pick, row[i] being the clue for candidates[i].
+        '''
+        perm = row.argsort(kind='stable')
+        sorted_clues = row[perm]
+
+        # Groups start wherever the sorted clue changes
+        bounds = np.empty(len(row) + 1, dtype=bool)
+        bounds[0] = bounds[-1] = True
+        np.not_equal(sorted_clues[1:], sorted_clues[:-1], out=bounds[1:-1])
+        offsets = bounds.nonzero()[0]
+
+        return cls(sorted_clues[offsets[:-1]], offsets, candidates[perm])
+
+    def sizes(self):
+        ''' Return the number of candidates for each clue '''
+        return self.offsets[1:] - self.offsets[:-1]
+
+    def score(self):
+        ''' Return the group sizes in descending order as a list '''
+        return sorted(self.sizes().tolist(), reverse=True)
+
+    def is_perfect(self):
+        ''' True if every candidate gets a distinct clue '''
+        return len(self.clues) == len(self.order)
+
+    def key(self):
+        ''' Return a hashable key that is equal for equal partitions '''
+        return (self.clues.tobytes(), self.offsets.tobytes(), self.order.tobytes())
+
+    def __len__(self):
+        return len(self.clues)
+
+    def __iter__(self):
+        return iter(self.clues.tolist())
+
+    def __contains__(self, clue):
+        i = np.searchsorted(self.clues, clue)
+        return i < len(self.clues) and self.clues[i] == clue
+
+    def __getitem__(self, clue):
+        i = int(np.searchsorted(self.clues, clue))
+        if i == len(self.clues) or self.clues[i] != clue:
+            raise KeyError(clue)
+        return self.order[self.offsets[i]:self.offsets[i + 1]]
+
+    def keys(self):
+        return self.clues.tolist()
+
+    def values(self):
+        order, offsets = self.order, self.offsets.tolist()
+        return [order[a:b] for a, b in zip(offsets, offsets[1:])]
+
+    def items(self):
+        return list(zip(self.keys(), self.values()))
+
+    def __repr__(self):
+        return f"Partition({dict(self.items())})"
+
+
+def _hash_rows(block):
+    ''' Return a 64 bit hash of each row of a C-contiguous 2D array '''
+    data = block.view(np.uint8).reshape(len(block), -1)
+    n_words = data.shape[1] // 8
+    words = data[:, :n_words * 8].view(np.uint64)
+    hashes = np.full(len(block), data.shape[1], dtype=np.uint64)
+
+    with np.errstate(over='ignore'):
+        for column in (*words.T, *data[:, n_words * 8:].T):
+            hashes ^= column
+            hashes *= _HASH_MULTIPLIER
+            hashes ^= hashes >> np.uint64(29)
+
+    return hashes
+
+
+def first_unique_rows(block):
+    '''
+    Return the indices, in order, of the first occurrence of each distinct row
+    of a 2D array. Rows are grouped by a 64 bit hash and then compared, so a
+    hash collision can't merge distinct rows.
+    '''
+    block = np.ascontiguousarray(block)
+    if len(block) <= 1:
+        return np.arange(len(block))
+
+    _, first, group = np.unique(_hash_rows(block), return_index=True,
+                                return_inverse=True)
+
+    if not (block == block[first[group]]).all():
+        # A collision: group by the raw bytes of each row instead
+        rows = block.view(np.dtype((np.void, block.strides[0]))).ravel()
+        _, first = np.unique(rows, return_index=True)
+
+    return np.sort(first)
+
+
+class PickClasses:
+    '''
+    The classes of equivalent picks at a search node, i.e. picks giving the
+    same clue for every candidate, which partition the candidates the same
+    way. Only one representative pick and its clue row are kept per class,
+    along with the hash of the row. Rows are appended to a buffer that grows
+    geometrically, so folding a batch only hashes and copies the batch.
+    '''
+    def __init__(self):
+        self.picks = np.zeros(0, dtype=np.intp)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self._buffer = None
+
+    def __len__(self):
+        return len(self.picks)
+
+    def __contains__(self, pick):
+        ''' True if pick represents a class '''
+        return bool((self.picks == pick).any())
+
+    @property
+    def rows(self):
+        ''' The clue rows of the representatives, or None before any fold '''
+        return None if self._buffer is None else self._buffer[:len(self.picks)]
+
+    def fold(self, picks, block):
+        '''
+        Fold a batch of picks, given their (picks x candidates) clue block,
+        into the known classes. Returns a mask of the picks that represent a
+        new class.
+        '''
+        picks = np.asarray(picks, dtype=np.intp)
+        rows = self.rows
+        block = np.ascontiguousarray(block, dtype=None if rows is None else rows.dtype)
+        if not len(block):
+            return np.zeros(0, dtype=bool)
+
+        n_seen = len(self.picks)
+        block_hashes = _hash_rows(block)
+
+        # Known representatives come first, so they are always kept. Each
+        # row of the batch is compared with the first row with its hash, as
+        # the representatives are already distinct.
+        _, first, group = np.unique(np.concatenate((self.hashes, block_hashes)),
+                                    return_index=True, return_inverse=True)
+        same = first[group.ravel()[n_seen:]]
+        known = same < n_seen
+        reps = block[np.maximum(same - n_seen, 0)]
+        if n_seen:
+            reps[known] = rows[same[known]]
+
+        if (reps == block).all():
+            new = same == np.arange(n_seen, n_seen + len(block))
+        else:
+            # A collision: compare every row
+            keep = first_unique_rows(block if rows is None else
+                                     np.concatenate((rows, block)))
+            new = np.zeros(len(picks), dtype=bool)
+            new[keep[keep >= n_seen] - n_seen] = True
+
+        self._append(picks[new], block[new], block_hashes[new])
+        return new
+
+    def _append(self, picks, rows, hashes):
+        n_seen, n_total = len(self.picks), len(self.picks) + len(picks)
+        if self._buffer is None or len(self._buffer) < n_total:
+            capacity = n_total if self._buffer is None else max(n_total, 2 * len(self._buffer))
+            buffer = np.empty((capacity, rows.shape[1]), dtype=rows.dtype)
+            if self._buffer is not None:
+                buffer[:n_seen] = self._buffer[:n_seen]
+            self._buffer = buffer
+
+        self._buffer[n_seen:n_total] = rows
+        self.picks = np.concatenate((self.picks, picks))
+        self.hashes = np.concatenate((self.hashes, hashes))
+
+
+def clue_histograms(block):
+    '''
+    Count the candidates giving each clue for every pick of a (picks x
+    candidates) block of clue ordinals, with a 2D bincount. Only the clues
+    present in the block get a column. Returns the histogram of shape
+    (picks, clues) and the sorted array of clues for its columns.
+    '''
+    n_picks, n_candidates = block.shape
+    if block.size == 0:
+        return np.zeros((n_picks, 0), dtype=np.intp), np.zeros(0, dtype=block.dtype)
+
+    present = np.zeros(int(block.max()) + 1, dtype=bool)
+    present[block.ravel()] = True
+    clues = present.nonzero()[0].astype(block.dtype)
+    label = np.cumsum(present, dtype=np.intp) - 1
+    n_clues = len(clues)
+
+    hist = np.empty((n_picks, n_clues), dtype=np.intp)
+    chunk = max(1, _HISTOGRAM_ELEMENTS // max(n_candidates, n_clues))
+
+    for start in range(0, n_picks, chunk):
+        labels = label[block[start:start + chunk]]
+        labels += (np.arange(len(labels)) * n_clues)[:, None]
+        hist[start:start + chunk] = np.bincount(
+            labels.ravel(), minlength=len(labels) * n_clues).reshape(-1, n_clues)
+
+    return hist, clues
+
+
+class PickRanking:
+    '''
+    A batch of picks scored together for a node's candidates. The scores are
+    the partition sizes of each pick in descending order, zero padded, and
+    are taken from the clue histograms of the (picks x candidates) block, so
+    partitions are only materialized for the picks that are expanded.
+    '''
+    def __init__(self, picks, block, candidates, all_green=None):
+        self.picks = np.asarray(picks, dtype=np.intp)
+        self.block = block
+        self.candidates = candidates
+
+        hist, clues = clue_histograms(block)
+        self.n_groups = np.count_nonzero(hist, axis=1)
+        width = int(self.n_groups.max(initial=0))
+        self.scores = np.sort(hist, axis=1)[:, ::-1][:, :width]
+        self.perfect = self.n_groups == len(candidates)
+
+        # Whether each pick can be the secret itself
+        green = np.searchsorted(clues, all_green) if all_green is not None else len(clues)
+        if green < len(clues) and clues[green] == all_green:
+            self.solves = hist[:, green] > 0
+        else:
+            self.solves = np.zeros(len(self.picks), dtype=bool)
+
+    def __len__(self):
+        return len(self.picks)
+
+    def valid(self):
+        ''' Mask of the picks that split the candidates or may solve '''
+        return (self.n_groups > 1) | self.solves
+
+    @classmethod
+    def concatenate(cls, rankings):
+        ''' Return the ranking of the picks of a list of rankings of the
+        same candidates, in order '''
+        if len(rankings) == 1:
+            return rankings[0]
+
+        ranking = object.__new__(cls)
+        ranking.candidates = rankings[0].candidates
+        width = max(r.scores.shape[1] for r in rankings)
+        ranking.scores = np.concatenate([np.pad(r.scores, ((0, 0), (0, width - r.scores.shape[1])))
+                                         for r in rankings])
+        for name in ('picks', 'block', 'n_groups', 'perfect', 'solves'):
+            setattr(ranking, name, np.concatenate([getattr(r, name) for r in rankings]))
+        return ranking
+
+    def select(self, mask):
+        ''' Return the ranking of the picks selected by mask '''
+        ranking = object.__new__(PickRanking)
+        ranking.candidates = self.candidates
+        for name in ('picks', 'block', 'n_groups', 'scores', 'perfect', 'solves'):
+            setattr(ranking, name, getattr(self, name)[mask])
+        return ranking
+
+    def score(self, i):
+        ''' Return the score of the ith pick as a list, without padding '''
+        return self.scores[i, :self.n_groups[i]].tolist()
+
+    def partition(self, i):
+        ''' Materialize the partition of the candidates for the ith pick '''
+        return Partition.from_clues(self.candidates, self.block[i])
+
+    def first_perfect(self):
+        ''' Return the index of the first pick that splits the candidates
+        perfectly, or None '''
+        perfect = self.perfect.nonzero()[0]
+        return int(perfect[0]) if len(perfect) else None
+
+
+def best_picks(rankings, n=None, exclude=()):
+    '''
+    Return (ranking, index) for the n best picks over several rankings,
+    ordered by score and then pick. This is the order of (score list, pick)
+    tuples, as zero padding doesn't change how scores compare.
+    '''
+    rankings = [ranking for ranking in rankings if len(ranking)]
+    if not rankings:
+        return []
+
+    width = max(ranking.scores.shape[1] for ranking in rankings)
+    scores = np.zeros((sum(map(len, rankings)), width), dtype=np.intp)
+    sources = []
+    start = 0
+
+    for ranking in rankings:
+        stop = start + len(ranking)
+        scores[start:stop, :ranking.scores.shape[1]] = ranking.scores
+        sources.extend((ranking, i) for i in range(len(ranking)))
+        start = stop
+
+    picks = np.concatenate([ranking.picks for ranking in rankings])
+    order = np.lexsort((picks, *scores.T[::-1]))
+
+    if exclude:
+        order = order[~np.isin(picks[order], list(exclude))]
+
+    return [sources[i] for i in order[:n].tolist()]
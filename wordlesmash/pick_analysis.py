@@ -0,0 +1,99 @@
+import numpy as np
+
+from .bitset import Bitset
+from .partition import clue_histograms
+
+# Picks splitting the candidates into the most groups, which are tested as
+# dominators of every other pick
+DEFAULT_MAX_DOMINATORS = 256
+
+# Upper bound on the clues compared at once when testing dominance
+_CHUNK_ELEMENTS = 1 << 24
+
+# Pairs of candidates a dominator doesn't separate which are checked first,
+# which rules out most picks before comparing their whole rows
+_SAMPLE_PAIRS = 64
+
+
+class PickAnalysis:
+    '''
+    Equivalence and dominance of picks over all of a clue matrix's
+    candidates, which hold for every subset of them, so a search can drop
+    the redundant picks up front.
+
+    classes[p] is the first pick with the same clue for every candidate as
+    pick p. dominators[p] is a pick whose partition of the candidates is
+    strictly finer than p's, or -1. Such a pick p never splits any subset
+    of the candidates better than its dominator. Only strategic picks,
+    which can't be the secret, are dominated, and only the max_dominators
+    picks splitting the candidates into the most groups are dominators.
+    '''
+    def __init__(self, classes, dominators):
+        self.classes = classes
+        self.dominators = dominators
+
+    @classmethod
+    def from_matrix(cls, clue_matrix, n_candidates,
+                    max_dominators=DEFAULT_MAX_DOMINATORS):
+        ''' Analyze a dense (picks x candidates) clue matrix whose first
+        n_candidates picks are the candidates '''
+        rows = np.ascontiguousarray(clue_matrix)
+        columns = np.asfortranarray(clue_matrix) # for gathering candidates
+        n_picks, width = rows.shape
+
+        # Rows compare as opaque bytes, which sort faster than lexically
+        keys = rows.view(np.dtype((np.void, width * rows.itemsize))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        classes = first[inverse.ravel()].astype(np.intp)
+        dominators = np.full(n_picks, -1, dtype=np.intp)
+
+        n_groups = np.zeros(n_picks, dtype=np.intp)
+        n_groups[first] = np.count_nonzero(clue_histograms(rows[first])[0], axis=1)
+        strongest = first[np.lexsort((first, -n_groups[first]))[:max_dominators]]
+
+        targets = first[first >= n_candidates]
+        chunk = max(1, _CHUNK_ELEMENTS // max(width, 1))
+
+        for pick in strongest.tolist():
+            # A pick is coarser if its clue is constant within each group of
+            # the dominator's candidates, once sorted by the dominator's clue
+            perm = rows[pick].argsort(kind='stable')
+            clues = rows[pick, perm]
+            within = clues[1:] == clues[:-1]
+
+            open_targets = targets[(dominators[targets] < 0) &
+                                   (n_groups[targets] < n_groups[pick])]
+
+            pairs = within.nonzero()[0]
+            pairs = pairs[::max(1, len(pairs) // _SAMPLE_PAIRS)]
+            same = (columns[:, perm[pairs]][open_targets] ==
+                    columns[:, perm[pairs + 1]][open_targets])
+            open_targets = open_targets[same.all(axis=1)]
+
+            for start in range(0, len(open_targets), chunk):
+                batch = open_targets[start:start + chunk]
+                sub = rows[batch][:, perm]
+                changes = (sub[:, 1:] != sub[:, :-1]) & within
+                coarser = ~changes.any(axis=1)
+                dominators[batch[coarser]] = pick
+
+        return cls(classes, dominators[classes])
+
+    def prune(self, picks):
+        '''
+        Return the Bitset of picks without those equivalent to a lower pick
+        or dominated by a pick in picks.
+        '''
+        indices = picks.indices()
+        _, first = np.unique(self.classes[indices], return_index=True)
+        indices = indices[first]
+
+        dominators = self.dominators[indices]
+        present = np.zeros(len(self.classes), dtype=bool)
+        present[self.classes[indices]] = True
+        dominated = (dominators >= 0) & present[self.classes[np.maximum(dominators, 0)]]
+        return Bitset.from_indices(indices[~dominated])
+
+    def members(self, pick):
+        ''' Return the sorted int array of picks equivalent to pick '''
+        return (self.classes == self.classes[pick]).nonzero()[0]
@@ -0,0 +1,444 @@
+import os
+import pickle
+import sys
+from collections import OrderedDict
+from itertools import count
+from multiprocessing import get_all_start_methods, get_context
+from queue import Empty
+
+from .cancellation import SearchCancelled, SharedFlag
+from .shared_arrays import SharedArraysHandle, attach
+
+# Subproblems with fewer candidates are searched inline by the task that
+# reaches them rather than queued for any worker
+DEFAULT_MIN_TASK_CANDIDATES = 32
+
+# Batch slots, holding a cancellation flag and published bound, are
+# allocated from fixed arrays and freed when their batch closes
+_N_SLOTS = 1 << 16
+
+# Deepest profile that can be published as a bound
+_MAX_DEPTH = 16
+
+# How long a waiting task blocks for results before looking for work again
+_POLL_INTERVAL = 0.01
+
+# Tasks stacked in a worker by waiting tasks taking work from the queue,
+# beyond which a waiting task prefers to block for its own results
+_MAX_NESTED = 32
+
+# Set in each worker to its TaskScheduler
+_scheduler = None
+
+# Trees published for searches, unpickled once by each worker and kept for
+# the tasks of the search(es) in progress, by shared memory name
+_trees = OrderedDict()
+_MAX_TREES = 2
+
+
+def default_workers():
+    ''' Return the number of cores available to this process '''
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError: # not available on all platforms
+        return os.cpu_count() or 1
+
+
+def current_scheduler():
+    ''' Return the TaskScheduler of this worker process, or None '''
+    return _scheduler
+
+
+def resolve_tree(handle):
+    ''' Return the tree published in the shared block described by handle,
+    unpickling it on first use in this process '''
+    tree = _trees.get(handle.name)
+    if tree is not None:
+        _trees.move_to_end(handle.name)
+        return tree
+
+    tree = pickle.loads(attach(handle)['tree'])
+    tree.task_handle = handle # so its own batches refer to it too
+    _trees[handle.name] = tree
+    while len(_trees) > _MAX_TREES:
+        _trees.popitem(last=False)
+    return tree
+
+
+class Channels:
+    '''
+    The shared state of a pool: a queue of tasks taken by any worker, a
+    result queue per worker plus one for the main process, the stop flag
+    for the whole search, the cancellation flags and bounds of batches, and
+    the number of tasks each process is running.
+
+    A batch holds its slot until it closes. The slot's generation is bumped
+    each time it is allocated, so a batch is identified by (slot, generation)
+    and the tasks of a closed batch never see the flag or bound of a later
+    one.
+
+    A batch's bound is the profile its remaining tasks must fit, which its
+    owner tightens as results arrive. Bounds are written under a version
+    counter that is odd while a write is in progress, so readers never see
+    a partial write.
+    '''
+    def __init__(self, context, n_workers):
+        self.tasks = context.Queue()
+        self.results = [context.Queue() for _ in range(n_workers + 1)]
+        self.stop_event = SharedFlag(context)
+        self.busy = context.RawArray('i', n_workers + 1)
+        self.n_slots = _N_SLOTS
+        self.flags = context.RawArray('b', self.n_slots)
+        self.in_use = context.RawArray('b', self.n_slots)
+        self.generations = context.RawArray('L', self.n_slots)
+        self.next_slot = context.Value('L', 0)
+        self.versions = context.RawArray('L', self.n_slots)
+        self.bound_lengths = context.RawArray('b', self.n_slots)
+        self.bounds = context.RawArray('i', self.n_slots * _MAX_DEPTH)
+
+    def allocate(self):
+        ''' Return the (slot, generation) of a new batch, with a cleared
+        flag and no bound, or None if every slot is in use '''
+        counter = self.next_slot
+        with counter.get_lock():
+            start = counter.value
+            for i in range(self.n_slots):
+                slot = (start + i) % self.n_slots
+                if not self.in_use[slot]:
+                    break
+            else:
+                return None
+
+            counter.value = (slot + 1) % self.n_slots
+            self.in_use[slot] = 1
+            self.generations[slot] += 1
+            self.flags[slot] = 0
+            self.bound_lengths[slot] = 0
+            return slot, self.generations[slot]
+
+    def release(self, batch):
+        ''' Cancel the tasks of a closed batch and free its slot '''
+        slot, _ = batch
+        self.flags[slot] = 1
+        with self.next_slot.get_lock():
+            self.in_use[slot] = 0
+
+    def cancel(self, batch):
+        ''' Cancel the tasks of a batch, unless it already closed '''
+        slot, generation = batch
+        with self.next_slot.get_lock():
+            if self.generations[slot] == generation:
+                self.flags[slot] = 1
+
+    def cancelled(self, batch):
+        slot, generation = batch
+        return self.flags[slot] or self.generations[slot] != generation
+
+    def publish(self, batch, profile):
+        ''' Publish the bound of a batch. Only the batch's owner writes it,
+        and only while the batch holds its slot. '''
+        slot, generation = batch
+        if (not profile or len(profile) > _MAX_DEPTH or
+                self.generations[slot] != generation):
+            return
+
+        start = slot * _MAX_DEPTH
+        self.versions[slot] += 1
+        self.bounds[start:start + len(profile)] = profile
+        self.bound_lengths[slot] = len(profile)
+        self.versions[slot] += 1
+
+    def read_bound(self, batch):
+        ''' Return (version, profile) of a batch's bound, or None if it is
+        being written, wasn't published or the batch closed '''
+        slot, generation = batch
+        version = self.versions[slot]
+        length = self.bound_lengths[slot]
+        start = slot * _MAX_DEPTH
+        profile = self.bounds[start:start + length]
+
+        # A generation only grows, so checking it last also rejects a bound
+        # read while the slot was freed and allocated again
+        if (version % 2 or not length or self.versions[slot] != version or
+                self.generations[slot] != generation):
+            return None
+        return version, profile
+
+
+class TaskAbort:
+    '''
+    Abort signal of a task, set when the search is stopped or when the batch
+    of the task, or of any task it descends from, is cancelled. chain holds
+    the (slot, generation) of those batches, outermost first.
+    '''
+    def __init__(self, channels, chain):
+        self.channels = channels
+        self.chain = chain
+
+    def is_set(self):
+        return (any(self.channels.cancelled(batch) for batch in self.chain) or
+                self.channels.stop_event.is_set())
+
+    def set(self):
+        self.channels.cancel(self.chain[-1])
+
+
+class Incumbent:
+    '''
+    The bound a task's result must fit, as published for its batch by the
+    batch's owner. Tasks re-read it while searching, so results found by
+    siblings in other workers tighten their pruning. It is read for the
+    batch's (slot, generation), so it is never that of another batch.
+    '''
+    def __init__(self, channels, batch):
+        self.channels = channels
+        self.batch = batch
+        self.version = None
+
+    def read(self):
+        ''' Return the published profile if it changed since the last read,
+        or else None '''
+        bound = self.channels.read_bound(self.batch)
+        if bound is None or bound[0] == self.version:
+            return None
+        self.version, profile = bound
+        return profile
+
+
+class TaskScheduler:
+    '''
+    Schedules the subproblems of a batch, at any depth of the search, as
+    tasks on the pool's shared queue. Subproblems below the granularity
+    cutoff are searched inline. A worker waiting for the tasks of its batch
+    takes other tasks from the queue meanwhile, including its own, so
+    workers stay busy while a large branch is searched.
+    '''
+    def __init__(self, channels, index, can_steal=True, workers=()):
+        self.channels = channels
+        self.index = index
+        self.can_steal = can_steal
+        self.workers = workers
+        self._ids = count()
+        self._awaited = set()
+        self._stash = {}
+        self._nested = 0
+
+    def submit(self, tree, args, working_profile, chain):
+        task_id = (self.index, next(self._ids))
+        self._awaited.add(task_id)
+
+        # A tree published for the search is sent as its handle along with
+        # a compact descriptor of the subproblem. Others are sent whole.
+        handle = getattr(tree, 'task_handle', None)
+        if handle is not None:
+            tree, args = handle, tree.encode_task(args)
+
+        # Pickled here so a task is only unpickled by a worker once it is
+        # known not to be cancelled
+        payload = pickle.dumps((tree, args, working_profile),
+                               pickle.HIGHEST_PROTOCOL)
+        self.channels.tasks.put((task_id, chain, payload))
+        return task_id
+
+    def run(self, task):
+        ''' Search a task's subproblem and send the result to its owner '''
+        task_id, chain, payload = task
+        abort = TaskAbort(self.channels, chain)
+        self._nested += 1
+        self.channels.busy[self.index] = self._nested
+        try:
+            if abort.is_set():
+                result = (True, None)
+            else:
+                tree, args, working_profile = pickle.loads(payload)
+                if isinstance(tree, SharedArraysHandle):
+                    tree = resolve_tree(tree)
+                    args = tree.decode_task(args)
+                result = (True, tree.mod_dfs_beam_rec(
+                    *args, working_profile, True, abort,
+                    incumbent=Incumbent(self.channels, chain[-1])))
+        except SearchCancelled:
+            result = (True, None)
+        except Exception as e:
+            result = (False, e)
+        finally:
+            self._nested -= 1
+            self.channels.busy[self.index] = self._nested
+
+        self.channels.results[task_id[0]].put((task_id, result))
+
+    def serve(self):
+        ''' Run tasks from the queue until a None task is received '''
+        while (task := self.channels.tasks.get()) is not None:
+            self.run(task)
+
+    def _receive(self, timeout=None):
+        ''' Stash the results received for awaited tasks, waiting up to
+        timeout for the first. True if any were received. '''
+        queue = self.channels.results[self.index]
+        received = False
+        try:
+            while True:
+                if timeout:
+                    task_id, result = queue.get(timeout=timeout)
+                    timeout = None
+                else:
+                    task_id, result = queue.get_nowait()
+                received = True
+                if task_id in self._awaited:
+                    self._stash[task_id] = result
+        except Empty:
+            return received
+
+    def _help(self):
+        ''' Run a queued task, if any. True if one was run '''
+        if not self.can_steal:
+            return False
+        try:
+            task = self.channels.tasks.get_nowait()
+        except Empty:
+            return False
+
+        if task is None: # shutting down, leave it for a server loop
+            self.channels.tasks.put(None)
+            return False
+
+        self.run(task)
+        return True
+
+    def wait(self, ids, abort=None):
+        '''
+        Generate the results of the tasks in ids as they complete. Yields
+        None and stops if abort is set.
+        '''
+        pending = set(ids)
+        while pending:
+            if abort is not None and abort.is_set():
+                yield None
+                return
+
+            self._receive()
+            done = pending.intersection(self._stash)
+            for task_id in done:
+                pending.discard(task_id)
+                self._awaited.discard(task_id)
+                ok, value = self._stash.pop(task_id)
+                if not ok:
+                    raise value
+                yield value
+
+            if done:
+                continue
+            elif self._nested < _MAX_NESTED and self._help():
+                continue
+            elif not self._receive(_POLL_INTERVAL):
+                if not all(worker.is_alive() for worker in self.workers):
+                    raise RuntimeError("A search worker exited unexpectedly")
+                # Every worker may be waiting with a full stack
+                self._help()
+
+    def run_batch(self, tree, batch_args, working_profile, abort=None,
+                  min_candidates=DEFAULT_MIN_TASK_CANDIDATES):
+        '''
+        Search a batch of sibling subproblems, queueing those with at least
+        min_candidates candidates and searching the rest inline, and
+        generate the results as they complete. The consumer tallies each
+        result against working_profile before resuming the generator, which
+        then publishes it as the bound of the tasks still running. Tasks
+        still queued or running when the generator is closed are cancelled.
+        '''
+        queued = [args for args in batch_args if len(args[0]) >= min_candidates]
+        inline = [args for args in batch_args if len(args[0]) < min_candidates]
+        chain = abort.chain if isinstance(abort, TaskAbort) else ()
+        batch = self.channels.allocate() if queued else None
+        if batch is None: # no slot free, search the whole batch inline
+            queued, inline = [], batch_args
+        ids = []
+
+        try:
+            for args in queued:
+                ids.append(self.submit(tree, args, working_profile,
+                                       (*chain, batch)))
+
+            for args in inline:
+                yield tree.mod_dfs_beam_rec(*args, working_profile, False, abort)
+                if batch is not None:
+                    self.channels.publish(batch, working_profile)
+
+            for result in self.wait(ids, abort):
+                yield result
+                self.channels.publish(batch, working_profile)
+        finally:
+            if batch is not None:
+                self.channels.release(batch)
+            self._awaited.difference_update(ids)
+            for task_id in ids:
+                self._stash.pop(task_id, None)
+
+
+def _worker_main(channels, index):
+    global _scheduler
+    # Waiting tasks stack the tasks they take from the queue
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    _scheduler = TaskScheduler(channels, index)
+    _scheduler.serve()
+
+
+class SearchPool:
+    '''
+    Long-lived worker processes that search subproblems in parallel. Workers
+    are started once, from a fork server where available, and serve tasks
+    from a shared queue for every search using the pool until it is shut
+    down. The main process submits its batches through scheduler.
+    '''
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or default_workers()
+        method = 'forkserver' if 'forkserver' in get_all_start_methods() else None
+        self._context = get_context(method)
+        if method == 'forkserver':
+            self._context.set_forkserver_preload(['wordlesmash.wordle_tree'])
+        self.channels = Channels(self._context, self.max_workers)
+        self.stop_event = self.channels.stop_event
+        self._workers = []
+        self._scheduler = None
+
+    @property
+    def scheduler(self):
+        ''' The main process's scheduler, starting the workers on first use '''
+        if self._scheduler is None:
+            # Daemonic, so an application exiting without shutting down the
+            # pool doesn't wait on workers serving the queue
+            self._workers = [self._context.Process(target=_worker_main,
+                                                   args=(self.channels, i),
+                                                   daemon=True)
+                             for i in range(self.max_workers)]
+            for worker in self._workers:
+                worker.start()
+            self._scheduler = TaskScheduler(self.channels, self.max_workers,
+                                            can_steal=False,
+                                            workers=self._workers)
+
+        return self._scheduler
+
+    def stop(self):
+        ''' Signal the running tasks to abort. Tasks still queued are
+        dropped by the workers without being searched. '''
+        self.stop_event.set()
+
+    def idle(self):
+        ''' True if no task is queued or running '''
+        return (not any(self.channels.busy[:self.max_workers]) and
+                self.channels.tasks.empty())
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self.stop()
+            for _ in self._workers:
+                self.channels.tasks.put(None)
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
+            self._scheduler = None
+
+    def __getstate__(self):
+        raise TypeError("SearchPool is not picklable")
@@ -0,0 +1,93 @@
+import logging
+from collections import namedtuple, OrderedDict
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Picklable description of a published block: the shared memory name and a
+# layout of (key, dtype, shape, offset, order) for each array within it.
+SharedArraysHandle = namedtuple('SharedArraysHandle', ['name', 'layout'])
+
+_ALIGNMENT = 64
+
+# Blocks attached by this process, keyed by shared memory name. Only a few
+# are kept, as workers only need the ones for the search(es) in progress:
+# the tables and the tree published for each.
+_attached = OrderedDict()
+_MAX_ATTACHED = 4
+
+
+class SharedArrays:
+    '''
+    Owner of a shared memory block holding a set of named numpy arrays. The
+    arrays are copied in once, after which other processes can attach to them
+    zero-copy through the small, picklable handle.
+    '''
+    def __init__(self, **arrays):
+        layout = []
+        size = 0
+
+        for key, array in arrays.items():
+            # Fortran ordered arrays keep their layout
+            order = 'F' if np.isfortran(array) else 'C'
+            array = np.asarray(array, order=order)
+            size = -(-size // _ALIGNMENT) * _ALIGNMENT
+            layout.append((key, array.dtype.str, array.shape, size, order))
+            size += array.nbytes
+
+        self._shm = SharedMemory(create=True, size=max(size, 1))
+        self.handle = SharedArraysHandle(self._shm.name, tuple(layout))
+        self.keys = tuple(arrays)
+
+        for (key, dtype, shape, offset, order), array in zip(layout, arrays.values()):
+            view = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf,
+                              offset=offset, order=order)
+            view[...] = array
+            del view
+
+    def close(self):
+        ''' Release and remove the shared memory block '''
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(handle):
+    '''
+    Return a dict of read-only arrays backed by the shared memory block
+    described by handle. Attachments are cached per process, so repeated
+    tasks for the same search attach only once.
+    '''
+    if handle.name in _attached:
+        _attached.move_to_end(handle.name)
+        return _attached[handle.name][1]
+
+    shm = SharedMemory(name=handle.name)
+    arrays = {}
+    for key, dtype, shape, offset, order in handle.layout:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset,
+                           order=order)
+        array.flags.writeable = False
+        arrays[key] = array
+
+    _attached[handle.name] = (shm, arrays)
+
+    while len(_attached) > _MAX_ATTACHED:
+        _, (old_shm, old_arrays) = _attached.popitem(last=False)
+        old_arrays.clear()
+        try:
+            old_shm.close()
+        except BufferError:
+            # Views are still referenced somewhere; leave it to the GC
+            logger.debug(f"Shared block still in use: {old_shm.name}")
+
+    return arrays
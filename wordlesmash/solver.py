@@ -7,6 +7,7 @@ from heapq import nsmallest, nlargest
 from .call_counter import call_counter
 from .wordle_game import Color
 from .wordle_tree import WordleTree
+from .cancellation import SharedFlag
 from itertools import chain, islice
 from abc import ABCMeta, abstractmethod, abstractclassmethod
 from .tree_utils import read_decision_tree, routes_to_dt, dt_to_routes, read_decision_routes
@@ -189,13 +190,14 @@ class GuessFilter:
     def to_filter_code(self):
 
         blacklist = {k:k in self.blacklist for k in self.alphabet}
-        return FilterCode(blacklist, self.letters, self.viable, self.confirmed)
+        return FilterCode(blacklist, self.letters, self.viable, self.confirmed,
+                          self.length)
 
 
     @classmethod
-    def from_filter_code(cls, fc, length=5, lexicon=None):
+    def from_filter_code(cls, fc, length=None, lexicon=None):
 
-        gf = GuessFilter(length=length, lexicon=lexicon)
+        gf = GuessFilter(length=length or fc.length, lexicon=lexicon)
 
         blacklist = {fc.ord_char[pos] for pos in np.where(fc.blacklist)[0]}
         gf.set_blacklist(blacklist)
@@ -886,7 +888,7 @@ class DecisionTreeGuessManager(AbstractGuessManager):
         self.tree = None
         # self._cond = threading.Condition()
         self._stop = False
-        self._stop_event = multiprocessing.Event()
+        self._stop_event = SharedFlag()
         self._stop_lock = multiprocessing.Lock()
         self._search_in_progress = False
 
@@ -897,9 +899,16 @@ class DecisionTreeGuessManager(AbstractGuessManager):
             if self._search_in_progress:
                 self._stop_event.set()
                 self._search_in_progress = False
+                if self.tree is not None:
+                    self.tree.cancel() # also drop its queued parallel tasks
             else:
                 ... # no search active. What do we do about this? No effect?
 
+    def close(self):
+        ''' Shut down the tree's worker pool. Call before discarding the manager. '''
+        if self.tree is not None:
+            self.tree.close()
+
     def reset(self):
         # self.state = []
         self.pick_word_hist = []
@@ -959,7 +968,7 @@ class DecisionTreeGuessManager(AbstractGuessManager):
         
         with self._stop_lock:
             self._search_in_progress = False
-            self._stop_event = multiprocessing.Event()
+            self._stop_event = SharedFlag()
 
         contingency_solutions = self.filter.get_valid_contingency_solutions()
 
@@ -993,7 +1002,7 @@ class DecisionTreeGuessManager(AbstractGuessManager):
 
         with self._stop_lock:
             self._search_in_progress = False
-            self._stop_event = multiprocessing.Event() # should this just be cleared instead?
+            self._stop_event = SharedFlag() # should this just be cleared instead?
 
         return routes
 
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from textwrap import dedent
+from traceback import format_exception_only
+
+logger = logging.getLogger(__name__)
+
+# Nodes with fewer candidates are quicker to solve than to look up
+DEFAULT_MIN_CANDIDATES = 16
+DEFAULT_MAX_ENTRIES = 1 << 18
+
+# Cache hits whose use times are held in memory before they are written
+_MAX_PENDING = 256
+
+
+def words_key(words):
+    ''' Return a canonical hash of a collection of words '''
+    data = '\n'.join(sorted(words)).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class SubtreeCache:
+    '''
+    Persistent store of solved subtrees shared by searches, processes and
+    sessions. Each entry maps a search key (identifying the word lists and
+    picks searched), a candidate set and the branch rules to the best route
+    set found for those candidates, relative to the node, along with its
+    depth profile. Routes are stored as words, so entries don't depend on
+    the order of the word lists.
+
+    The database is opened lazily by each process that uses it. Errors are
+    logged and disable the cache for the process rather than the search.
+    Lookups only read it: the use times of hits are written in batches,
+    along with a store or when evicting, so processes sharing the database
+    rarely wait for its write lock.
+    '''
+    filename = 'subtrees.sqlite'
+
+    def __init__(self, cache_dir, min_candidates=DEFAULT_MIN_CANDIDATES,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = Path(cache_dir) / self.filename
+        self.min_candidates = min_candidates
+        self.max_entries = max_entries
+        self._db = None
+        self._failed = False
+        self._used = {} # {(search, candidates, rules): time of last hit}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_db'] = None # each process opens its own connection
+        state['_used'] = {}
+        return state
+
+    def _warn(self, e):
+        logger.warning(dedent(f"""
+                       Warning: Unable to use subtree cache.
+                       {format_exception_only(e)}""").strip())
+        self._failed = True
+        self.close()
+
+    def _connect(self):
+        if self._db is None and not self._failed:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(self.path, timeout=30)
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('PRAGMA synchronous=NORMAL')
+                db.execute('''CREATE TABLE IF NOT EXISTS subtrees (
+                                  search TEXT, candidates TEXT, rules TEXT,
+                                  routes TEXT, profile TEXT, used REAL,
+                                  PRIMARY KEY (search, candidates, rules))''')
+                db.commit()
+                self._db = db
+            except (sqlite3.Error, OSError) as e:
+                self._warn(e)
+
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _write_used(self, db):
+        if self._used:
+            db.executemany('''UPDATE subtrees SET used = ? WHERE search = ? AND
+                              candidates = ? AND rules = ?''',
+                           [(used, *key) for key, used in self._used.items()])
+            self._used.clear()
+
+    def flush(self):
+        ''' Write the use times of the cache hits since the last write '''
+        db = self._connect()
+        if db is None or not self._used:
+            return
+
+        try:
+            self._write_used(db)
+            db.commit()
+        except sqlite3.Error as e:
+            self._warn(e)
+
+    def lookup(self, search, candidates, rules):
+        '''
+        Return (routes, profile) cached for the specified keys, with routes
+        as tuples of words relative to the node, or None if not cached.
+        '''
+        db = self._connect()
+        if db is None:
+            return None
+
+        try:
+            row = db.execute('''SELECT routes, profile FROM subtrees WHERE
+                                search = ? AND candidates = ? AND rules = ?''',
+                             (search, candidates, rules)).fetchone()
+        except sqlite3.Error as e:
+            self._warn(e)
+            return None
+
+        if row is None:
+            return None
+
+        self._used[search, candidates, rules] = time.time()
+        if len(self._used) >= _MAX_PENDING:
+            self.flush()
+
+        routes, profile = map(json.loads, row)
+        return tuple(map(tuple, routes)), profile
+
+    def store(self, search, candidates, rules, routes, profile):
+        ''' Save the relative route set, as tuples of words, for the keys '''
+        db = self._connect()
+        if db is None:
+            return
+
+        try:
+            db.execute('''INSERT OR REPLACE INTO subtrees VALUES
+                          (?, ?, ?, ?, ?, ?)''',
+                       (search, candidates, rules, json.dumps(routes),
+                        json.dumps(profile), time.time()))
+            self._used.pop((search, candidates, rules), None)
+            self._write_used(db)
+            db.commit()
+        except sqlite3.Error as e:
+            self._warn(e)
+
+    def evict(self):
+        ''' Delete the least recently used entries beyond max_entries '''
+        db = self._connect()
+        if db is None or self.max_entries is None:
+            self.flush()
+            return
+
+        try:
+            self._write_used(db)
+            db.execute('''DELETE FROM subtrees WHERE rowid IN (SELECT rowid FROM
+                          subtrees ORDER BY used DESC LIMIT -1 OFFSET ?)''',
+                       (self.max_entries,))
+            db.commit()
+        except sqlite3.Error as e:
+            self._warn(e)
@@ -0,0 +1,17 @@
+from .test_clue_matrix import *
+from .test_shared_arrays import *
+from .test_matrix_cache import *
+from .test_tiled_matrix import *
+from .test_candidate_view import *
+from .test_partition import *
+from .test_transposition import *
+from .test_subtree_cache import *
+from .test_search_pool import *
+from .test_bounds import *
+from .test_anytime import *
+from .test_exact import *
+from .test_bitset import *
+from .test_clue_index import *
+from .test_opening_book import *
+from .test_pick_analysis import *
+from .test_filter_code import *
@@ -0,0 +1,54 @@
+import random
+import tempfile
+import unittest
+from importlib.resources import files
+
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree, depth_profile
+
+
+class TestAnytimeSearch(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 300)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 200)
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.tree = WordleTree(self.candidates, picks, cache_path=cache_dir.name,
+                               subtree_cache=False)
+        self.addCleanup(self.tree.close)
+
+    def test_improvements(self):
+        improvements = []
+        routes = self.tree.mod_dfs_beam_search(
+            on_improve=lambda routes, profile: improvements.append((routes, profile)))
+
+        self.assertEqual(improvements[-1], (routes, depth_profile(routes)))
+        profiles = [profile for _, profile in improvements]
+        self.assertEqual(profiles, sorted(profiles, key=lambda p: (len(p), p[::-1]),
+                                          reverse=True))
+
+    def test_budget(self):
+        tree = self.tree
+        start, found = tree.nodes_searched, []
+        full = tree.mod_dfs_beam_search(
+            on_improve=lambda routes, profile: found.append(tree.nodes_searched - start))
+        self.assertGreater(len(found), 1)
+
+        # Stopping before the last improvement returns the best so far
+        improvements = []
+        routes = tree.mod_dfs_beam_search(
+            node_budget=found[-2] + 1,
+            on_improve=lambda routes, profile: improvements.append(routes))
+
+        self.assertEqual(len(improvements), len(found) - 1)
+        self.assertEqual(routes, improvements[-1])
+        self.assertNotEqual(routes, full)
+        self.assertEqual({route[-1] for route in routes}, set(self.candidates))
+        self.assertEqual(tree.mod_dfs_beam_search(time_budget=0), ())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from ..bitset import Bitset
+from ..partition import candidate_array
+
+
+class TestBitset(unittest.TestCase):
+
+    def test_set_operations(self):
+        rng = np.random.default_rng(0)
+
+        for n in (0, 1, 7, 64, 65, 3000):
+            a = set(rng.choice(5000, n, replace=False).tolist())
+            b = set(rng.choice(5000, n, replace=False).tolist())
+            x, y = Bitset.from_indices(a), Bitset.from_indices(b)
+
+            self.assertEqual(x.indices().tolist(), sorted(a))
+            self.assertEqual(list(x), sorted(a))
+            self.assertEqual(len(x), len(a))
+            self.assertEqual(bool(x), bool(a))
+            self.assertEqual(list(x & y), sorted(a & b))
+            self.assertEqual(list(x | y), sorted(a | b))
+            self.assertEqual(list(x - y), sorted(a - b))
+            self.assertEqual(list(x ^ y), sorted(a ^ b))
+            self.assertTrue(all(i in x for i in a))
+            self.assertFalse(any(i in x for i in b - a))
+            self.assertEqual(candidate_array(x).tolist(), sorted(a))
+
+    def test_mask_hash_and_pickle(self):
+        mask = np.arange(100) % 3 == 0
+        bits = Bitset.from_mask(mask)
+        self.assertEqual(bits, Bitset.from_indices(mask.nonzero()[0]))
+        self.assertEqual(hash(bits), hash(Bitset.from_indices(range(0, 100, 3))))
+        self.assertNotEqual(bits, Bitset.from_indices(range(1, 100, 3)))
+        self.assertEqual(pickle.loads(pickle.dumps(bits)), bits)
+        self.assertNotIn(-1, bits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from functools import lru_cache
+
+import numpy as np
+
+from ..bounds import max_solved_by_level, min_profile, pick_min_profile
+from ..partition import Partition, candidate_array
+from ..transposition import profile_fits
+
+ALL_GREEN = 9
+
+
+def add_profiles(*profiles):
+    total = [0] * max(map(len, profiles))
+    for profile in profiles:
+        for i, n in enumerate(profile):
+            total[i] += n
+    return total
+
+
+class TestBounds(unittest.TestCase):
+
+    def test_max_solved_by_level(self):
+        self.assertEqual(max_solved_by_level(1, 5), (1,))
+        self.assertEqual(max_solved_by_level(2, 5), (1, 1))
+        self.assertEqual(max_solved_by_level(9, 3), (1, 3, 5))
+        self.assertEqual(max_solved_by_level(20, 2), (1, 2, 4, 8, 5))
+        self.assertEqual(min_profile(9, 2, 3), [0, 0, 1, 3, 5])
+
+    def test_admissible(self):
+        ''' The bounds are no better than the best route sets, found by
+        exhaustive search of small random clue matrices '''
+        rng = np.random.default_rng(0)
+
+        for _ in range(20):
+            n, n_picks = rng.integers(2, 7), rng.integers(6, 10)
+            matrix = rng.integers(0, 4, (n_picks, n)).astype(np.uint8)
+            matrix[np.arange(n), np.arange(n)] = ALL_GREEN
+            max_clues = max(len(set(row)) for row in matrix.tolist())
+
+            def split(candidates, pick):
+                return Partition.from_clues(candidates, matrix[pick, candidates])
+
+            @lru_cache(maxsize=None)
+            def best(candidates, depth):
+                candidates = candidate_array(candidates)
+                options = []
+                for pick in range(n_picks):
+                    part = split(candidates, pick)
+                    if len(part) > 1 or ALL_GREEN in part:
+                        options.append(pick_best(part, depth))
+                return min(options, key=lambda profile: (len(profile), profile[::-1]))
+
+            def pick_best(part, depth):
+                profiles = [[0] * depth + [1] if clue == ALL_GREEN else
+                            [0] * (depth + 1) + [1] if len(group) == 1 else
+                            best(tuple(group.tolist()), depth + 1)
+                            for clue, group in part.items()]
+                return add_profiles(*profiles)
+
+            candidates = candidate_array(range(n))
+            for depth in (0, 2):
+                optimum = best(tuple(range(n)), depth)
+                self.assertTrue(profile_fits(min_profile(n, depth, max_clues), optimum))
+
+                for pick in range(n_picks):
+                    part = split(candidates, pick)
+                    if len(part) > 1 or ALL_GREEN in part:
+                        self.assertTrue(profile_fits(
+                            pick_min_profile(part, depth, max_clues, ALL_GREEN),
+                            pick_best(part, depth)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import pickle
+import random
+import tempfile
+import unittest
+from importlib.resources import files
+
+import numpy as np
+
+from ..clue_matrix import CandidateView, compute_clue_matrix
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree
+
+
+class TestCandidateView(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 120)
+        self.secrets = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 60)
+
+    def test_views(self):
+        matrix = compute_clue_matrix(self.picks, self.secrets)
+        candidates = {45, 3, 17, 30, 8, 59}
+
+        for layout in (matrix, np.asfortranarray(matrix)):
+            view = CandidateView.from_matrix(layout, candidates)
+            self.assertEqual(view.secrets, tuple(sorted(candidates)))
+            self.assertTrue(view.clues.flags.c_contiguous)
+            np.testing.assert_array_equal(view.row(100), matrix[100, sorted(candidates)])
+
+            child = view.child(frozenset({30, 3, 59}))
+            self.assertEqual(child.secrets, (3, 30, 59))
+            np.testing.assert_array_equal(child.clues, matrix[:, [3, 30, 59]].T)
+
+    def test_layouts_agree(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            by_pick = WordleTree(self.secrets, self.picks, cache_path=cache_path,
+                                 layout='pick', subtree_cache=False)
+            by_secret = WordleTree(self.secrets, self.picks, cache_path=cache_path,
+                                   layout='secret', subtree_cache=False)
+
+        self.assertTrue(by_pick.clue_matrix.flags.c_contiguous)
+        self.assertTrue(by_secret.clue_matrix.flags.f_contiguous)
+        self.assertEqual(by_pick.mod_dfs_beam_search(), by_secret.mod_dfs_beam_search())
+
+        # Workers attach to the shared matrix in the same layout
+        with by_secret.share_tables():
+            copy = pickle.loads(pickle.dumps(by_secret))
+            self.assertTrue(copy.clue_matrix.flags.f_contiguous)
+            np.testing.assert_array_equal(copy.clue_matrix, by_secret.clue_matrix)
+
+
+if __name__ == '__main__':
+    unittest.main()
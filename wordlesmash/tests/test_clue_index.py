@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+
+from ..bitset import Bitset
+from ..clue_index import ClueIndex
+
+
+class TestClueIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.matrix = rng.integers(0, 5, (20, 300)).astype(np.uint8)
+
+    def test_secrets(self):
+        index = ClueIndex(self.matrix, max_picks=4)
+
+        for pick in range(len(self.matrix)):
+            for clue in range(6):
+                expected = (self.matrix[pick] == clue).nonzero()[0].tolist()
+                self.assertEqual(list(index.secrets(pick, clue)), expected)
+            self.assertLessEqual(len(index._groups), 4)
+
+    def test_filter(self):
+        index = ClueIndex(self.matrix)
+        candidates = Bitset.from_indices(range(0, 300, 2))
+        pick_hist, clue_hist = (3, 7), (1, 4)
+
+        expected = [secret for secret in range(0, 300, 2)
+                    if self.matrix[3, secret] == 1 and self.matrix[7, secret] == 4]
+        self.assertEqual(list(index.filter(candidates, pick_hist, clue_hist)), expected)
+        self.assertEqual(index.filter(candidates, (), ()), candidates)
+
+
+if __name__ == '__main__':
+    unittest.main()
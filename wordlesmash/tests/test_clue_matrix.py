@@ -0,0 +1,68 @@
+import random
+import unittest
+from importlib.resources import files
+
+import numpy as np
+
+from ..clue_matrix import compute_clue_matrix, encode_words
+from ..utils import load_word_list
+from ..wordle_game import Color, get_clue_for_secret
+
+
+def reference_clue_matrix(picks, secrets):
+    clue_matrix = np.empty((len(picks), len(secrets)), dtype=np.uint8)
+
+    for i, pick in enumerate(picks):
+        for j, secret in enumerate(secrets):
+            clue_matrix[i, j] = Color.ordinal(get_clue_for_secret(pick, secret))
+
+    return clue_matrix
+
+
+class TestClueMatrix(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    # Words chosen to exercise duplicate letter handling
+    duplicates = ('SPEED', 'ERASE', 'EERIE', 'ABBEY', 'BOBBY', 'LLAMA', 'ALLOY',
+                  'EAGER', 'GEESE', 'STEEL', 'LEVEL', 'MAMMA', 'ABACK')
+
+    def test_duplicate_letters(self):
+        result = compute_clue_matrix(self.duplicates, self.duplicates)
+        expected = reference_clue_matrix(self.duplicates, self.duplicates)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_random_sample(self):
+        rng = random.Random(0)
+        picks = load_word_list(self.words_path / 'wordle_picks.txt')
+        candidates = load_word_list(self.words_path / 'wordle_candidates.txt')
+        picks = (*self.duplicates, *rng.sample(picks, 300))
+        candidates = rng.sample(candidates, 200)
+
+        result = compute_clue_matrix(picks, candidates)
+        expected = reference_clue_matrix(picks, candidates)
+
+        self.assertEqual(result.dtype, expected.dtype)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_word_lengths(self):
+        rng = random.Random(0)
+
+        for length, dtype in ((4, np.uint8), (5, np.uint8), (6, np.uint16),
+                              (7, np.uint16), (8, np.uint16)):
+            # A small alphabet makes duplicate letters common
+            words = [''.join(rng.choices('ABCDE', k=length)) for _ in range(60)]
+            result = compute_clue_matrix(words, words[:40])
+            expected = [[Color.ordinal(get_clue_for_secret(pick, secret))
+                         for secret in words[:40]] for pick in words]
+
+            self.assertEqual(result.dtype, dtype)
+            np.testing.assert_array_equal(result, expected)
+
+    def test_encode_words(self):
+        codes = encode_words(('CAB', 'ABC'))
+        np.testing.assert_array_equal(codes, [[2, 0, 1], [0, 1, 2]])
+        self.assertRaises(ValueError, encode_words, ('ABC', 'ABCD'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from functools import lru_cache
+
+import numpy as np
+
+from ..exact import ExactSolver, profile_key
+from ..partition import Partition, candidate_array
+
+ALL_GREEN = 9
+
+
+class TestExactSolver(unittest.TestCase):
+
+    def test_profile_key(self):
+        profiles = [[1, 3], [1, 2, 1], [0, 4, 0], [2, 0, 1], [1, 1, 1]]
+        self.assertEqual(sorted(profiles, key=profile_key),
+                         [[1, 3], [0, 4, 0], [2, 0, 1], [1, 1, 1], [1, 2, 1]])
+
+    def test_optimal(self):
+        ''' Matches an exhaustive search without pruning or bitsets '''
+        rng = np.random.default_rng(0)
+
+        for _ in range(20):
+            n, n_picks = rng.integers(2, 9), rng.integers(6, 12)
+            matrix = rng.integers(0, 4, (n_picks, n)).astype(np.uint8)
+            matrix[np.arange(n), np.arange(n)] = ALL_GREEN
+            picks = np.arange(n_picks)
+            candidates = np.arange(n)
+
+            @lru_cache(maxsize=None)
+            def best(members):
+                members = candidate_array(members)
+                if len(members) == 1:
+                    return (1,)
+                options = []
+                for pick in range(n_picks):
+                    part = Partition.from_clues(members, matrix[pick, members])
+                    if len(part) == 1 and ALL_GREEN not in part:
+                        continue
+                    total = [0]
+                    for clue, group in part.items():
+                        if clue == ALL_GREEN:
+                            total[0] += 1
+                            continue
+                        profile = (1,) if len(group) == 1 else best(tuple(group.tolist()))
+                        total.extend([0] * (1 + len(profile) - len(total)))
+                        for i, count in enumerate(profile, 1):
+                            total[i] += count
+                    options.append(total)
+                return tuple(min(options, key=profile_key))
+
+            solver = ExactSolver(matrix.T, picks, candidates, ALL_GREEN)
+            self.assertEqual(solver.solve(), best(tuple(range(n))))
+
+            routes = solver.routes(pick_hist=(99,))
+            self.assertEqual(sorted(route[-1] for route in routes), list(range(n)))
+            counts = [0] * len(solver.solve())
+            for route in routes:
+                self.assertEqual(route[0], 99)
+                counts[len(route) - 2] += 1
+            self.assertEqual(tuple(counts), solver.solve())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from collections import Counter
+
+from ..filter_code import FilterCode
+
+try:
+    from ..solver import GuessFilter
+except ImportError: # the solver needs scipy
+    GuessFilter = None
+
+
+class TestFilterCode(unittest.TestCase):
+    lengths = (4, 5, 6, 7)
+
+    def assertRoundTrip(self, code):
+        _, chars, mask = code.unpack_bytes(code.pack_to_bytes())
+        self.assertEqual(chars, code.unpack_known_chars())
+        self.assertEqual(mask, code.presence.tolist())
+
+    def test_layout(self):
+        for n in self.lengths:
+            code = FilterCode(known_chars=Counter(), length=n)
+            self.assertEqual(len(code.bits), 5 * n + n * n + 26)
+            self.assertEqual(code.presence.shape, (n, n))
+            self.assertEqual(code.unpack_known_chars(), [None] * n)
+            self.assertRoundTrip(code)
+
+    def test_known_chars(self):
+        for n in self.lengths:
+            viable = {None: [True] * n, 'A': [False] + [True] * (n - 1),
+                      'E': [True] * n}
+            confirmed = {None: [False] * n, 'A': [False] * n,
+                         'E': [False] * (n - 1) + [True]}
+            code = FilterCode({'Z': True}, Counter({'E': 2, 'A': 1}), viable,
+                              confirmed, length=n)
+
+            self.assertEqual(code.unpack_known_chars(),
+                             ['A', 'E', 'E'] + [None] * (n - 3))
+            self.assertEqual(code.get_blacklist_chars(), {'Z'})
+            self.assertRoundTrip(code)
+
+    def test_add_yg(self):
+        for n in self.lengths:
+            code = FilterCode(known_chars=Counter(), length=n)
+            code.add_yg('R', green=True, slot=n - 1)
+            code.add_yg('A', slot=0)
+
+            self.assertEqual(code.unpack_known_chars(), ['A', 'R'] + [None] * (n - 2))
+            self.assertFalse(code.presence[0, 0]) # A is yellow in the first slot
+            self.assertEqual(code.presence[:, n - 1].tolist(),
+                             [False, True] + [False] * (n - 2)) # R is green
+            self.assertRoundTrip(code)
+
+            for slot in range(n - 2):
+                code.add_yg('S', slot=slot)
+            self.assertTrue(code.is_fully_known())
+            self.assertFalse(code.blacklist.any())
+            self.assertRoundTrip(code)
+
+            code.add_yg('T', slot=0) # no room for another letter
+            self.assertNotIn('T', code.unpack_known_chars())
+
+    @unittest.skipIf(GuessFilter is None, "scipy is not installed")
+    def test_guess_filter(self):
+        # T is green in the last slot, E is yellow in the fourth
+        guess = GuessFilter(6)
+        guess.letters = Counter({'T': 1, 'E': 1, None: 4})
+        guess.viable = {None: [True] * 5 + [False],
+                        'T': [True] * 5 + [False],
+                        'E': [True] * 3 + [False, True, False]}
+        guess.confirmed = {None: [False] * 6, 'T': [False] * 5 + [True],
+                           'E': [False] * 6}
+        guess.set_blacklist({'Q', 'Z'})
+
+        code = guess.to_filter_code()
+        self.assertEqual(code.length, 6)
+        self.assertRoundTrip(code)
+
+        restored = GuessFilter.from_filter_code(code)
+        self.assertEqual(restored.length, 6)
+        self.assertEqual(restored.letters, guess.letters)
+        self.assertEqual(restored.to_filter_code(), code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from importlib.resources import files
+from unittest import mock
+
+import numpy as np
+
+from ..clue_matrix import compute_clue_matrix
+from ..matrix_cache import MatrixCache
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree
+
+
+class TestMatrixCache(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def setUp(self):
+        rng = random.Random(0)
+        picks = load_word_list(self.words_path / 'wordle_picks.txt')
+        candidates = load_word_list(self.words_path / 'wordle_candidates.txt')
+        self.picks = rng.sample(picks, 300)
+        self.candidates = rng.sample(candidates, 200)
+        self.cache = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache.cleanup)
+
+    def assertMatrixValid(self, tree):
+        expected = compute_clue_matrix(tree._all_picks, tree._all_candidates)
+        np.testing.assert_array_equal(tree.clue_matrix, expected)
+
+    def test_incremental_update(self):
+        WordleTree(self.candidates, self.picks, cache_path=self.cache.name)
+
+        picks = self.picks[1:] + ['ZESTY', 'QUACK']
+        candidates = self.candidates[2:] + ['OZONE']
+
+        with mock.patch.object(WordleTree, 'precompute_clues') as precompute:
+            tree = WordleTree(candidates, picks, cache_path=self.cache.name)
+            precompute.assert_not_called()
+
+        self.assertMatrixValid(tree)
+
+    def test_superset_extraction(self):
+        WordleTree(self.candidates, self.picks, cache_path=self.cache.name)
+        cached = sorted(Path(self.cache.name).iterdir())
+
+        with mock.patch.object(WordleTree, 'precompute_clues') as precompute:
+            tree = WordleTree(self.candidates[::2], self.picks[::3],
+                              cache_path=self.cache.name)
+            precompute.assert_not_called()
+
+        self.assertMatrixValid(tree)
+        self.assertEqual(sorted(Path(self.cache.name).iterdir()), cached)
+
+    def test_metadata_and_eviction(self):
+        cache = MatrixCache(self.cache.name, max_bytes=None)
+        matrix = np.zeros((30, 20), dtype=np.uint8)
+        picks, candidates = self.picks[:30], self.picks[:20]
+
+        for i, name in enumerate(('a', 'b', 'c')):
+            cache.save(f'word_matrix_{name}.npy', matrix, picks, candidates)
+            os.utime(cache.path(f'word_matrix_{name}.npy'), (i, i))
+
+        metadata = cache.read_metadata(cache.path('word_matrix_a.npy'))
+        self.assertEqual(metadata['n_picks'], 30)
+        self.assertEqual(metadata['n_candidates'], 20)
+        self.assertEqual(metadata['word_length'], 5)
+        self.assertEqual(metadata['dtype'], '|u1')
+        self.assertFalse([*Path(self.cache.name).glob('*.tmp')])
+
+        # Files get the default mode, as np.save would give them
+        reference = Path(self.cache.name) / 'reference'
+        reference.touch()
+        mode = reference.stat().st_mode
+        reference.unlink()
+        for path in Path(self.cache.name).iterdir():
+            self.assertEqual(path.stat().st_mode & 0o777, mode & 0o777)
+
+        # Using a matrix makes it the most recently used
+        self.assertIsNotNone(cache.load('word_matrix_a.npy'))
+
+        # Sidecar sizes vary slightly with their timestamps
+        entry_size = max(sum(p.stat().st_size for p in
+                             Path(self.cache.name).glob(f'word_matrix_{name}.*'))
+                         for name in ('a', 'b', 'c'))
+        cache.max_bytes = 2 * entry_size
+        cache.evict()
+
+        remaining = sorted(p.name for p in Path(self.cache.name).glob('*.npy'))
+        self.assertEqual(remaining, ['word_matrix_a.npy', 'word_matrix_c.npy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
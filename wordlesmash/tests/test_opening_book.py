@@ -0,0 +1,81 @@
+import io
+import random
+import tempfile
+import unittest
+from importlib.resources import files
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+from ..opening_book import NODE, SEARCH, OpeningBook, main
+from ..partition import candidate_array
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree
+
+
+class TestOpeningBook(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def setUp(self):
+        rng = random.Random(1)
+        candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 400)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 300)
+
+        self.cache = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache.cleanup)
+        self.tree = WordleTree(candidates, picks, cache_path=self.cache.name,
+                               subtree_cache=False)
+
+    def test_round_trip(self):
+        book = self.tree.build_opening_book(n_openers=3)
+        loaded = OpeningBook.load(self.tree.opening_book_path)
+
+        self.assertGreater(len(book), 2)
+        self.assertEqual(loaded.entries.keys(), book.entries.keys())
+        for key, entry in book.entries.items():
+            for name in entry.__slots__:
+                self.assertEqual(getattr(loaded.entries[key], name), getattr(entry, name))
+
+    def test_search(self):
+        routes = self.tree.mod_dfs_beam_search()
+        self.tree.build_opening_book(n_openers=3)
+
+        # The booked levels aren't ranked, and the routes are unchanged
+        with mock.patch.object(self.tree, '_rank_node', wraps=self.tree._rank_node) as rank:
+            self.assertEqual(self.tree.mod_dfs_beam_search(), routes)
+
+        booked = self.tree.opening_book()
+        for (candidates, picks, *_), _ in rank.call_args_list:
+            self.assertIsNone(booked.lookup(NODE, candidate_array(candidates), picks))
+
+    def test_main(self):
+        rng = random.Random(2)
+        lists = {name: rng.sample(load_word_list(self.words_path / f'wordle_{name}.txt'), 200)
+                 for name in ('candidates', 'picks')}
+        for name, words in lists.items():
+            Path(self.cache.name, f'{name}.txt').write_text('\n'.join(words))
+
+        cache_dir = str(Path(self.cache.name, 'cache'))
+        with redirect_stdout(io.StringIO()):
+            main([cache_dir, '--openers', '2',
+                  '-c', str(Path(self.cache.name, 'candidates.txt')),
+                  '-p', str(Path(self.cache.name, 'picks.txt'))])
+
+        # The app's tree of the same lists finds its search booked
+        tree = WordleTree(tuple(sorted(lists['candidates'])), tuple(sorted(lists['picks'])),
+                          cache_path=cache_dir, subtree_cache=False)
+        candidates, picks = tree._fix_candidates_and_picks(None, None)
+        self.assertIsNotNone(tree.opening_book().lookup(
+            SEARCH, candidate_array(candidates), picks))
+
+    def test_missing_book(self):
+        self.assertIsNone(self.tree.opening_book())
+        tree = WordleTree(['abcde'], ['abcde'], cache_path=self.cache.name,
+                          opening_book=False)
+        self.assertIsNone(tree.opening_book())
+        with self.assertRaises(ValueError):
+            tree.build_opening_book()
+
+
+if __name__ == '__main__':
+    unittest.main()
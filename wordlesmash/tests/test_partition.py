@@ -0,0 +1,105 @@
+import heapq
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from .. import partition
+from ..partition import (Partition, PickClasses, PickRanking, best_picks,
+                         candidate_array, first_unique_rows)
+
+
+class TestPartition(unittest.TestCase):
+
+    def test_from_clues(self):
+        rng = np.random.default_rng(0)
+
+        for n in (1, 2, 10, 200):
+            candidates = np.sort(rng.choice(1000, n, replace=False))
+            row = rng.integers(0, 12, n).astype(np.uint8)
+            part = Partition.from_clues(candidates, row)
+
+            expected = {}
+            for secret, clue in zip(candidates.tolist(), row.tolist()):
+                expected.setdefault(clue, []).append(secret)
+
+            self.assertEqual(len(part), len(expected))
+            self.assertEqual(part.keys(), sorted(expected))
+            self.assertEqual({clue: group.tolist() for clue, group in part.items()},
+                             expected)
+            self.assertEqual(part.score(),
+                             sorted(map(len, expected.values()), reverse=True))
+            self.assertEqual(part.is_perfect(), all(len(g) == 1 for g in expected.values()))
+
+            for clue in range(12):
+                self.assertEqual(clue in part, clue in expected)
+            self.assertRaises(KeyError, part.__getitem__, 12)
+
+    def test_key(self):
+        candidates = candidate_array({7, 3, 5, 1})
+        part = Partition.from_clues(candidates, np.array([2, 0, 2, 1], dtype=np.uint8))
+        same = Partition.from_clues(candidates, np.array([2, 0, 2, 1], dtype=np.uint8))
+        relabeled = Partition.from_clues(candidates, np.array([2, 0, 2, 3], dtype=np.uint8))
+
+        np.testing.assert_array_equal(candidates, [1, 3, 5, 7])
+        np.testing.assert_array_equal(part[2], [1, 5])
+        self.assertEqual(part.key(), same.key())
+        self.assertNotEqual(part.key(), relabeled.key())
+
+    def test_pick_ranking(self):
+        rng = np.random.default_rng(1)
+        candidates = np.sort(rng.choice(500, 30, replace=False))
+        block = rng.integers(0, 6, (40, 30)).astype(np.uint8)
+        block[7] = np.arange(30) # a perfect split
+        block[9] = 5 # no split
+        block[9, 3] = 0
+        block[11] = 4 # no split, but solves
+        picks = rng.choice(1000, 40, replace=False)
+        ranking = PickRanking(picks, block, candidates, all_green=0)
+
+        parts = [Partition.from_clues(candidates, row) for row in block]
+        for i, part in enumerate(parts):
+            self.assertEqual(ranking.score(i), part.score())
+            self.assertEqual(ranking.partition(i).key(), part.key())
+        self.assertEqual(ranking.first_perfect(), 7)
+        self.assertEqual(ranking.valid().tolist(), [i not in (11,) and len(p) > 1 or 0 in p
+                                                    for i, p in enumerate(parts)])
+
+        # Same order as ranking (score, pick) tuples
+        entries = [(part.score(), int(pick)) for part, pick in zip(parts, picks)]
+        expected = [pick for _, pick in sorted(heapq.nsmallest(10, entries))]
+        self.assertEqual([int(r.picks[i]) for r, i in best_picks([ranking], 10)], expected)
+
+        first, second = ranking.select(np.arange(40) < 25), ranking.select(np.arange(40) >= 25)
+        excluded = {expected[0]}
+        self.assertEqual([int(r.picks[i]) for r, i in best_picks([first, second], 10, excluded)],
+                         [pick for _, pick in sorted(entries) if pick not in excluded][:10])
+
+    def test_first_unique_rows(self):
+        rng = np.random.default_rng(2)
+
+        for dtype, width in ((np.uint8, 3), (np.uint8, 21), (np.uint16, 9)):
+            block = rng.integers(0, 3, (200, width)).astype(dtype)
+            expected = sorted({row.tobytes(): i for i, row in reversed([*enumerate(block)])}.values())
+            self.assertEqual(first_unique_rows(block).tolist(), expected)
+
+            # Colliding hashes still leave distinct rows apart
+            with mock.patch.object(partition, '_hash_rows',
+                                   lambda rows: np.zeros(len(rows), dtype=np.uint64)):
+                self.assertEqual(first_unique_rows(block).tolist(), expected)
+
+    def test_pick_classes(self):
+        classes = PickClasses()
+        block = np.array([[0, 1], [2, 2], [0, 1], [1, 0]], dtype=np.uint8)
+
+        self.assertEqual(classes.fold([10, 11, 12, 13], block).tolist(),
+                         [True, True, False, True])
+        self.assertEqual(classes.fold([20, 21], block[[3, 0]] ^ [[0, 0], [1, 0]]).tolist(),
+                         [False, True])
+        self.assertEqual(classes.picks.tolist(), [10, 11, 13, 21])
+        self.assertIn(21, classes)
+        self.assertNotIn(12, classes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import random
+import tempfile
+import unittest
+from importlib.resources import files
+from unittest import mock
+
+import numpy as np
+
+from ..bitset import Bitset
+from ..pick_analysis import PickAnalysis
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree
+
+
+def is_coarser(row, other):
+    ''' True if row's clue is a function of other's clue '''
+    return len(set(zip(other.tolist(), row.tolist()))) == len(set(other.tolist()))
+
+
+class TestPickAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_candidates = 12
+        matrix = rng.integers(0, 6, (60, n_candidates)).astype(np.uint8)
+        # Equivalent rows and rows coarsened by merging clues
+        matrix[40:45] = matrix[20:25]
+        matrix[45:55] = matrix[rng.integers(0, 40, 10)] // 2
+        self.matrix, self.n_candidates = matrix, n_candidates
+
+    def test_brute_force(self):
+        analysis = PickAnalysis.from_matrix(self.matrix, self.n_candidates,
+                                            max_dominators=len(self.matrix))
+
+        for pick, row in enumerate(self.matrix):
+            first = next(i for i, other in enumerate(self.matrix) if (other == row).all())
+            self.assertEqual(analysis.classes[pick], first)
+            self.assertEqual(analysis.members(pick).tolist(),
+                             (self.matrix == row).all(axis=1).nonzero()[0].tolist())
+
+            dominator = analysis.dominators[pick]
+            dominated = pick >= self.n_candidates and any(
+                len(np.unique(other)) > len(np.unique(row)) and is_coarser(row, other)
+                for other in self.matrix)
+            self.assertEqual(dominator >= 0, dominated)
+            if dominated:
+                self.assertTrue(is_coarser(row, self.matrix[dominator]))
+                self.assertGreater(len(np.unique(self.matrix[dominator])),
+                                   len(np.unique(row)))
+
+    def test_prune(self):
+        analysis = PickAnalysis.from_matrix(self.matrix, self.n_candidates,
+                                            max_dominators=len(self.matrix))
+        picks = analysis.prune(Bitset.from_indices(range(len(self.matrix))))
+
+        self.assertEqual(picks.indices().tolist(),
+                         [pick for pick in range(len(self.matrix))
+                          if analysis.classes[pick] == pick and analysis.dominators[pick] < 0])
+
+        # Picks are only dropped for a dominator that is searched too
+        dominated = (analysis.dominators >= 0).nonzero()[0]
+        pick = int(dominated[0])
+        dominator = int(analysis.dominators[pick])
+        others = set(analysis.members(dominator).tolist())
+        kept = analysis.prune(Bitset.from_indices(i for i in range(len(self.matrix))
+                                                  if i not in others))
+        self.assertIn(pick, kept)
+
+
+class TestTreePickAnalysis(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def test_cached(self):
+        rng = random.Random(5)
+        candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 40)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 300)
+
+        with tempfile.TemporaryDirectory() as cache_path:
+            tree = WordleTree(candidates, picks, cache_path=cache_path)
+            self.assertGreater((tree.pick_analysis.dominators >= 0).sum(), 0)
+
+            with mock.patch.object(PickAnalysis, 'from_matrix') as analyze:
+                cached = WordleTree(candidates, picks, cache_path=cache_path)
+                analyze.assert_not_called()
+            np.testing.assert_array_equal(cached.pick_analysis.dominators,
+                                          tree.pick_analysis.dominators)
+
+            # Searches don't use the dropped picks
+            _, pruned = tree._fix_candidates_and_picks(None, picks)
+            dominated = (tree.pick_analysis.dominators >= 0).nonzero()[0]
+            self.assertFalse(set(dominated.tolist()) & set(pruned))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+import unittest
+from importlib.resources import files
+from unittest import mock
+
+import numpy as np
+
+from .. import search_pool
+from ..search_pool import (Incumbent, SearchPool, TaskAbort, TaskScheduler,
+                           resolve_tree)
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree
+
+
+class PidTree:
+    ''' Stands in for a tree, reporting where each subproblem was searched '''
+    def mod_dfs_beam_rec(self, candidates, *args, **kwargs):
+        return (os.getpid(), len(candidates))
+
+
+class TestSearchPool(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_path = cache_dir.name
+
+    def test_run_batch(self):
+        pool = SearchPool(max_workers=2)
+        try:
+            batch_args = [(range(n),) for n in (40, 3, 50, 5, 60)]
+            for _ in range(2): # workers serve every batch
+                results = list(pool.scheduler.run_batch(PidTree(), batch_args, [],
+                                                        min_candidates=10))
+                self.assertEqual(sorted(n for _, n in results), [3, 5, 40, 50, 60])
+                inline = {n for pid, n in results if pid == os.getpid()}
+                self.assertEqual(inline, {3, 5})
+        finally:
+            pool.shutdown()
+
+    def test_incumbent(self):
+        channels = SearchPool(max_workers=1).channels
+        batch = channels.allocate()
+        incumbent = Incumbent(channels, batch)
+        self.assertIsNone(incumbent.read())
+
+        channels.publish(batch, [0, 3, 2])
+        self.assertEqual(incumbent.read(), [0, 3, 2])
+        self.assertIsNone(incumbent.read()) # unchanged
+        channels.publish(batch, [0, 3, 1])
+        self.assertEqual(incumbent.read(), [0, 3, 1])
+
+    def test_slot_reuse(self):
+        with mock.patch.object(search_pool, '_N_SLOTS', 4):
+            channels = SearchPool(max_workers=1).channels
+        live = channels.allocate()
+        channels.publish(live, [0, 2])
+        incumbent = Incumbent(channels, live)
+
+        # Nested batches wrap around the slots without reusing the live one
+        for _ in range(10):
+            batch = channels.allocate()
+            self.assertNotEqual(batch[0], live[0])
+            abort = TaskAbort(channels, (live, batch))
+            channels.publish(batch, [0, 1])
+            self.assertFalse(abort.is_set())
+            channels.release(batch)
+            self.assertTrue(abort.is_set())
+        self.assertFalse(TaskAbort(channels, (live,)).is_set())
+        self.assertEqual(incumbent.read(), [0, 2])
+
+        # The tasks of a closed batch see neither the flag nor the bound of
+        # a later batch given its slot
+        channels.release(live)
+        batches = [channels.allocate() for _ in range(channels.n_slots)]
+        self.assertIn(live[0], [slot for slot, _ in batches])
+        for batch in batches:
+            channels.publish(batch, [0, 3])
+        self.assertTrue(TaskAbort(channels, (live,)).is_set())
+        self.assertIsNone(Incumbent(channels, live).read())
+        channels.publish(live, [0, 1])
+        self.assertEqual([Incumbent(channels, batch).read() for batch in batches],
+                         [[0, 3]] * len(batches))
+        TaskAbort(channels, (live,)).set()
+        self.assertFalse(any(channels.cancelled(batch) for batch in batches))
+
+        # With every slot in use, a batch is searched inline
+        self.assertIsNone(channels.allocate())
+        scheduler = TaskScheduler(channels, 1)
+        results = list(scheduler.run_batch(PidTree(), [(range(40),), (range(3),)],
+                                           [], min_candidates=10))
+        self.assertEqual(sorted(results), [(os.getpid(), 3), (os.getpid(), 40)])
+
+    def test_parallel_search(self):
+        rng = random.Random(1)
+        candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 80)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 60)
+
+        tree = WordleTree(candidates, picks, cache_path=self.cache_path,
+                          subtree_cache=False, max_workers=2,
+                          min_task_candidates=4)
+        try:
+            serial = tree.mod_dfs_beam_search()
+            self.assertEqual(tree.mod_dfs_beam_search(parallel=True), serial)
+            scheduler = tree.search_pool().scheduler
+            self.assertEqual(tree.mod_dfs_beam_search(parallel=True), serial)
+            self.assertIs(tree.search_pool().scheduler, scheduler)
+        finally:
+            tree.close()
+
+    def test_task_payload(self):
+        rng = random.Random(2)
+        candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 300)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 2000)
+
+        tree = WordleTree(candidates, picks, cache_path=self.cache_path,
+                          subtree_cache=False, dt={candidates[0]: {}})
+        self.addCleanup(tree.close)
+        _, pick_set = tree._fix_candidates_and_picks(None, picks)
+        args = (np.arange(10, 200, 3), pick_set, (5, 7), (12, 40), tree.dt, 1)
+        tree._search_dt = tree.dt
+
+        with tree.publish_search():
+            payload = pickle.dumps((tree.task_handle, tree.encode_task(args), [0, 1]))
+            self.assertLess(len(payload), 1024)
+
+            published = resolve_tree(tree.task_handle)
+            self.assertIs(resolve_tree(tree.task_handle), published)
+            decoded = published.decode_task(tree.encode_task(args))
+            np.testing.assert_array_equal(decoded[0], args[0])
+            self.assertEqual(decoded[1:], args[1:])
+            self.assertEqual(published.task_handle, tree.task_handle)
+
+        self.assertIsNone(tree.task_handle)
+
+    def test_cancel_latency(self):
+        rng = random.Random(3)
+        candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 1200)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 3000)
+
+        tree = WordleTree(candidates, picks, cache_path=self.cache_path,
+                          subtree_cache=False, opening_book=False,
+                          max_workers=2, min_task_candidates=4)
+        try:
+            pool = tree.search_pool()
+            search = threading.Thread(target=tree.mod_dfs_beam_search,
+                                      kwargs=dict(parallel=True))
+            search.start()
+
+            deadline = time.monotonic() + 60
+            while not any(pool.channels.busy[:pool.max_workers]):
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+
+            start = time.monotonic()
+            tree.cancel()
+            search.join(1)
+            while not pool.idle() and time.monotonic() - start < 1:
+                time.sleep(0.001)
+            elapsed = time.monotonic() - start
+
+            self.assertFalse(search.is_alive())
+            self.assertTrue(pool.idle())
+            self.assertLess(elapsed, 0.1)
+        finally:
+            tree.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..shared_arrays import SharedArrays, attach
+from ..wordle_tree import WordleTree
+
+
+class TestSharedArrays(unittest.TestCase):
+
+    def test_attach(self):
+        matrix = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        words = np.array(['ABC', 'DEF'])
+
+        with SharedArrays(matrix=matrix, words=words, count=np.array(2)) as shared:
+            handle = pickle.loads(pickle.dumps(shared.handle))
+            arrays = attach(handle)
+            np.testing.assert_array_equal(arrays['matrix'], matrix)
+            np.testing.assert_array_equal(arrays['words'], words)
+            self.assertEqual(int(arrays['count']), 2)
+            self.assertFalse(arrays['matrix'].flags.writeable)
+
+    def test_tree_pickles_handle_only(self):
+        words = ('CRANE', 'SLATE', 'ABBEY', 'SPEED', 'ERASE', 'LLAMA')
+        with tempfile.TemporaryDirectory() as cache_path:
+            tree = WordleTree(words[:4], words, cache_path=cache_path)
+
+        with tree.share_tables():
+            data = pickle.dumps(tree)
+            self.assertNotIn(b'SLATE', data)
+            copy = pickle.loads(data)
+            np.testing.assert_array_equal(copy.clue_matrix, tree.clue_matrix)
+            self.assertEqual(copy.word_idx, tree.word_idx)
+            self.assertEqual(copy._all_candidates, tree._all_candidates)
+
+
+if __name__ == '__main__':
+    unittest.main()
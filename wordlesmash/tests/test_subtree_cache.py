@@ -0,0 +1,74 @@
+import random
+import sqlite3
+import tempfile
+import unittest
+from importlib.resources import files
+from unittest import mock
+
+from ..subtree_cache import SubtreeCache, words_key
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree
+
+
+class TestSubtreeCache(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache.cleanup()
+
+    def test_store_and_evict(self):
+        cache = SubtreeCache(self.cache.name, max_entries=2)
+        routes = (('CRANE',), ('SLATE', 'ABBEY'))
+        self.assertEqual(words_key(['B', 'A']), words_key(('A', 'B')))
+        self.assertIsNone(cache.lookup('s', 'c1', 'r'))
+
+        for key in ('c1', 'c2', 'c3'):
+            cache.store('s', key, 'r', routes, [1, 1])
+        self.assertEqual(cache.lookup('s', 'c1', 'r'), (routes, [1, 1]))
+        self.assertIsNone(cache.lookup('s', 'c1', 'other rules'))
+
+        cache.evict()
+        found = [cache.lookup('s', key, 'r') is not None for key in ('c1', 'c2', 'c3')]
+        self.assertEqual(found, [True, False, True])
+        cache.close()
+
+    def test_batched_use_times(self):
+        cache = SubtreeCache(self.cache.name)
+        cache.store('s', 'c1', 'r', (('CRANE',),), [1])
+        db = sqlite3.connect(cache.path)
+        used = lambda: db.execute("SELECT used FROM subtrees").fetchone()[0]
+        stored = used()
+
+        # Hits are written by flush, not by the lookup
+        self.assertIsNotNone(cache.lookup('s', 'c1', 'r'))
+        self.assertEqual(used(), stored)
+        cache.flush()
+        self.assertGreater(used(), stored)
+        db.close()
+        cache.close()
+
+    def test_unusable_path(self):
+        with tempfile.NamedTemporaryFile(dir=self.cache.name) as f:
+            cache = SubtreeCache(f.name)
+            with self.assertLogs('wordlesmash.subtree_cache', 'WARNING'):
+                self.assertIsNone(cache.lookup('s', 'c', 'r'))
+            cache.store('s', 'c', 'r', (), [])
+
+    def test_reused_by_new_search(self):
+        rng = random.Random(0)
+        candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 80)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 100)
+        routes = WordleTree(candidates, picks, cache_path=self.cache.name).mod_dfs_beam_search()
+
+        # Only the top level ranks picks, as the root node is cached
+        tree = WordleTree(candidates, picks, cache_path=self.cache.name)
+        with mock.patch.object(WordleTree, 'rank_picks', autospec=True,
+                               side_effect=WordleTree.rank_picks) as rank_picks:
+            self.assertEqual(tree.mod_dfs_beam_search(), routes)
+        self.assertEqual(rank_picks.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import pickle
+import random
+import tempfile
+import unittest
+from importlib.resources import files
+
+import numpy as np
+
+from ..clue_matrix import TiledClueMatrix, compute_clue_matrix
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree
+
+
+class TestTiledClueMatrix(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 100)
+        self.secrets = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 40)
+        self.dense = compute_clue_matrix(self.picks, self.secrets)
+        # Small tiles and budget to exercise eviction
+        self.tiled = TiledClueMatrix(self.picks, self.secrets, tile_rows=16,
+                                     max_bytes=3 * 16 * 40)
+
+    def test_indexing(self):
+        dense, tiled = self.dense, self.tiled
+        picks = [99, 3, 50, 17, 3]
+        secrets = [0, 39, 7]
+
+        self.assertEqual(tiled.shape, dense.shape)
+        self.assertEqual(tiled[42, 7], dense[42, 7])
+        np.testing.assert_array_equal(tiled[np.int64(42)], dense[42])
+        np.testing.assert_array_equal(tiled[42, secrets], dense[42, secrets])
+        np.testing.assert_array_equal(tiled[picks], dense[picks])
+        np.testing.assert_array_equal(tiled[10:60], dense[10:60])
+        np.testing.assert_array_equal(tiled[picks][:, secrets], dense[picks][:, secrets])
+        self.assertLessEqual(len(tiled._tiles), tiled.max_tiles)
+
+    def test_pickle(self):
+        self.tiled[0]
+        copy = pickle.loads(pickle.dumps(self.tiled))
+        self.assertFalse(copy._tiles)
+        np.testing.assert_array_equal(copy[:], self.dense)
+
+    def test_tree_search(self):
+        candidates = self.secrets
+        with tempfile.TemporaryDirectory() as cache_path:
+            dense = WordleTree(candidates, self.picks, cache_path=cache_path,
+                               subtree_cache=False)
+            tiled = WordleTree(candidates, self.picks, cache_path=cache_path,
+                               tiled=True, subtree_cache=False)
+
+        self.assertIsInstance(tiled.clue_matrix, TiledClueMatrix)
+        self.assertEqual(tiled.mod_dfs_beam_search(),
+                         dense.mod_dfs_beam_search())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import random
+import tempfile
+import unittest
+from importlib.resources import files
+
+from ..transposition import TranspositionTable, profile_fits
+from ..utils import load_word_list
+from ..wordle_tree import WordleTree, tally_and_test
+
+
+class TestTranspositionTable(unittest.TestCase):
+    words_path = files('wordlesmash.words')
+
+    def test_profile_fits(self):
+        for profile, bound in (([1, 3, 2], [1, 2, 3]), ([1, 2, 3], [1, 3, 2]),
+                               ([0, 4], [0, 4]), ([0, 9], [0, 3, 1]),
+                               ([0, 1, 1], [0, 5]), ([2], [])):
+            routes = [(0,) * (depth + 1) for depth, n in enumerate(profile)
+                      for _ in range(n)]
+            self.assertEqual(profile_fits(profile, bound),
+                             tally_and_test(routes, list(bound)), (profile, bound))
+
+    def test_lookup(self):
+        memo = TranspositionTable()
+        self.assertEqual(memo.lookup('a', (7,), []), (False, None))
+
+        memo.store('a', (7,), [], ((7, 1), (7, 2, 3)))
+        self.assertEqual(memo.lookup('a', (9,), []), (True, ((9, 1), (9, 2, 3))))
+        self.assertEqual(memo.lookup('a', (9,), [0, 1, 1]), (True, ((9, 1), (9, 2, 3))))
+        self.assertEqual(memo.lookup('a', (9,), [0, 2]), (True, None))
+
+        # Failures answer lookups under bounds at least as tight
+        memo.store('b', (7,), [0, 2, 1], None)
+        self.assertEqual(memo.lookup('b', (7,), [0, 3]), (True, None))
+        self.assertEqual(memo.lookup('b', (7,), [0, 2, 2]), (False, None))
+
+        # Only the loosest failed bounds are kept
+        memo.store('b', (7,), [0, 2, 2], None)
+        memo.store('b', (7,), [0, 4], None)
+        memo.store('b', (7,), [0, 1, 2], None)
+        self.assertEqual(memo._entries['b'][2], ((0, 2, 2),))
+        memo.store('b', (7,), [0, 2, 3], None)
+        self.assertEqual(memo._entries['b'][2], ((0, 2, 3),))
+
+    def test_eviction(self):
+        memo = TranspositionTable(max_routes=4)
+        for key in 'abc':
+            memo.store(key, (), [], ((1,), (2, 3)))
+        memo.lookup('b', (), [])
+        memo.store('d', (), [], ((1,),))
+
+        self.assertEqual([found for found, _ in map(lambda k: memo.lookup(k, (), []), 'abcd')],
+                         [False, True, False, True])
+
+    def test_search(self):
+        rng = random.Random(0)
+        candidates = rng.sample(load_word_list(self.words_path / 'wordle_candidates.txt'), 247)
+        picks = rng.sample(load_word_list(self.words_path / 'wordle_picks.txt'), 167)
+
+        with tempfile.TemporaryDirectory() as cache_path:
+            tree = WordleTree(candidates, picks, cache_path=cache_path,
+                              subtree_cache=False)
+            plain = WordleTree(candidates, picks, cache_path=cache_path,
+                               memo_max_routes=None, subtree_cache=False)
+
+        self.assertEqual(tree.mod_dfs_beam_search(), plain.mod_dfs_beam_search())
+        self.assertGreater(tree.transpositions.hits, 0)
+        self.assertIsNone(plain.transpositions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ROUTES = 1 << 20
+
+
+def candidate_set_key(candidates):
+    ''' Return a canonical hash of a sorted int array of candidates '''
+    data = np.ascontiguousarray(candidates, dtype=np.int64).tobytes()
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def profile_fits(profile, bound):
+    '''
+    True if a route set with the specified depth profile fits within bound,
+    the profile of the route set to match or beat. This is the test applied
+    by tally_and_test: compared from the deepest level, the first level that
+    differs must have fewer routes. An empty bound fits everything.
+    '''
+    if not bound:
+        return True
+
+    width = max(len(profile), len(bound))
+    profile = [*profile, *[0] * (width - len(profile))]
+    bound = [*bound, *[0] * (width - len(bound))]
+    return profile[::-1] <= bound[::-1]
+
+
+class TranspositionTable:
+    '''
+    Memo of the search nodes solved during a search, so a remaining candidate
+    set reached through different picks is solved once. Entries are keyed by
+    the caller and hold the best route set found, relative to the node, or
+    else the bounds under which nothing was found.
+
+    A node's result under a bound is its unbounded result if that fits the
+    bound and None otherwise, so a route set answers lookups under any
+    bound, and a failure answers lookups under bounds at least as tight.
+    The least recently used entries are evicted once more than max_routes
+    routes are stored.
+    '''
+    def __init__(self, max_routes=DEFAULT_MAX_ROUTES):
+        self.max_routes = max_routes
+        self._entries = OrderedDict()
+        self._n_routes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key, pick_hist, bound):
+        '''
+        Return (True, result) if the node's result under bound is known,
+        where result is the route set with the pick_hist prefix restored or
+        None. Otherwise return (False, None).
+        '''
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            routes, profile, failed = entry
+
+            if routes is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if profile_fits(profile, bound):
+                    return True, tuple(pick_hist + route for route in routes)
+                return True, None
+
+            if any(profile_fits(bound, fail) for fail in failed):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, None
+
+        self.misses += 1
+        return False, None
+
+    def store(self, key, pick_hist, bound, routes):
+        ''' Record the result of a node searched under bound '''
+        if routes is not None:
+            depth = len(pick_hist)
+            routes = tuple(route[depth:] for route in routes)
+            profile = depth_profile(pick_hist, routes)
+            self._discard(key)
+            self._entries[key] = (routes, profile, ())
+            self._n_routes += len(routes)
+            self._evict()
+        elif bound:
+            # Only the loosest failed bounds are kept, as a failure answers
+            # every bound that fits within it
+            entry = self._entries.get(key)
+            failed = entry[2] if entry is not None else ()
+            if not any(profile_fits(bound, fail) for fail in failed):
+                failed = (*(fail for fail in failed if not profile_fits(fail, bound)),
+                          tuple(bound))
+            self._entries[key] = (None, None, failed)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def clear(self):
+        self._entries.clear()
+        self._n_routes = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[0] is not None:
+            self._n_routes -= len(entry[0])
+
+    def _evict(self):
+        while self._n_routes > self.max_routes or len(self._entries) > self.max_routes:
+            _, (routes, _, _) = self._entries.popitem(last=False)
+            if routes is not None:
+                self._n_routes -= len(routes)
+
+
+def depth_profile(pick_hist, routes):
+    ''' Return the depth profile of relative routes below pick_hist '''
+    counts = [0] * (len(pick_hist) + max((len(route) for route in routes), default=0))
+    for route in routes:
+        counts[len(pick_hist) + len(route) - 1] += 1
+    return counts
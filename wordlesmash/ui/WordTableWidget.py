@@ -146,6 +146,7 @@ class WordTableWidget(QTableWidget):
 
     def __init__(self, rows=1, cols=5, color_callback=None, parent=None):
         super().__init__(rows, cols, parent)
+        self.word_length = cols
         self._submitEnabled = True
         self._withdrawEnabled = True
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
@@ -345,11 +346,17 @@ class WordTableWidget(QTableWidget):
             frame.update()
             print(f"Cell pressed: row={row}, col={col}, text={frame.text()}, cycled {current_color.name} -> {next_color.name}")
 
+    def setWordLength(self, length):
+        """Set the number of letters per row, clearing the table if changed."""
+        if length != self.word_length:
+            self.word_length = length
+            self.clear()
+
     def clear(self):
         """Override clear to reset to one blank row."""
         super().clear()
         self.setRowCount(1)
-        self.setColumnCount(5)
+        self.setColumnCount(self.word_length)
         self.initializeCells()
         self.setCurrentCell(0, 0)
         self.prev_focused_cell = (0, 0)
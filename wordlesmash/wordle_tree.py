@@ -3,6 +3,7 @@ import sys
 import numpy as np
 
 from itertools import count, chain
+from array import array
 from collections import namedtuple, Counter, defaultdict
 from functools import partial, cmp_to_key
 import tempfile
@@ -19,10 +20,29 @@ from .tree_utils import (read_decision_tree, read_decision_routes, dt_to_routes,
                         verify_routes)
 
 from .wordle_game import get_clue_for_secret
+from .clue_matrix import compute_clue_matrix, TiledClueMatrix, CandidateView
+from .partition import (Partition, PickClasses, PickRanking, best_picks,
+                        candidate_array)
+from .transposition import (TranspositionTable, DEFAULT_MAX_ROUTES,
+                            candidate_set_key, profile_fits)
+from .subtree_cache import SubtreeCache, words_key
+from .bounds import min_profile, pick_min_profile
+from .exact import ExactSolver
+from .bitset import Bitset
+from .clue_index import ClueIndex
+from .pick_analysis import PickAnalysis
+from .opening_book import (BookEntry, OpeningBook, load_book, SEARCH, NODE,
+                           DEFAULT_OPENERS, DEFAULT_TOP_PICKS, MAX_DEPTH as BOOK_DEPTH)
+from .search_pool import SearchPool, current_scheduler, DEFAULT_MIN_TASK_CANDIDATES
+from .cancellation import SearchCancelled, check_abort
+from .shared_arrays import SharedArrays, attach
+from .matrix_cache import MatrixCache, DEFAULT_MAX_BYTES
 from .utils import LazyList, load_word_list
 import cProfile
 import pstats
 import hashlib
+import json
+import pickle
 from traceback import format_exception_only
 from textwrap import dedent
 # from joblib import Parallel, delayed, parallel_backend
@@ -32,10 +52,23 @@ from multiprocessing import Event, get_context, Manager, Process
 from sortedcontainers import SortedDict
 from math import inf
 import threading
+import time
 from pathlib import Path
+from contextlib import contextmanager, nullcontext, closing
 
 logger = logging.getLogger(__name__)
 
+# Size (picks x candidates) above which the clue matrix is computed lazily in
+# tiles rather than precomputed and cached as a dense matrix
+TILED_MATRIX_ELEMENTS = 1 << 28
+
+# Nodes with at most this many candidates are solved exactly
+DEFAULT_EXACT_MAX_CANDIDATES = 30
+
+# Clues ranked between polls of the abort signal, which bounds how long a
+# large node takes to notice that its search was aborted
+RANK_CHUNK_ELEMENTS = 1 << 21
+
 class CompoundEvent:
     def __init__(self, *events):
         self.events = events
@@ -52,6 +85,31 @@ class CompoundEvent:
             event.clear()
 
 
+class SearchBudget:
+    '''
+    Abort signal of an anytime search, set once the wrapped abort event is
+    set, the deadline passes, or the tree has searched max_nodes more nodes.
+    Nodes are counted in this process only, so a node budget doesn't bound
+    work done by workers in a parallel search.
+    '''
+    def __init__(self, tree, abort=None, seconds=None, max_nodes=None):
+        self.tree = tree
+        self.abort = abort
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.node_limit = None if max_nodes is None else tree.nodes_searched + max_nodes
+        self._expired = False
+
+    def is_set(self):
+        if not self._expired:
+            self._expired = ((self.abort is not None and self.abort.is_set()) or
+                             (self.deadline is not None and time.monotonic() >= self.deadline) or
+                             (self.node_limit is not None and self.tree.nodes_searched >= self.node_limit))
+        return self._expired
+
+    def set(self):
+        self._expired = True
+
+
 class StateNode:
     # Keys a single filter state where various word options will be explored,
     # evaluated and unltmitely decided on.
@@ -254,7 +312,18 @@ class OptionNode:
 
 
 class WordleTree():
-    def __init__(self, all_candidates, all_picks, dt=None, branch_rules=None, cache_path=None):
+    # Attributes that are published in shared memory during a parallel search
+    # rather than pickled along with every task sent to a worker
+    _SHARED_KEYS = ('clue_matrix', 'word_idx', 'idx_word', '_all_candidates',
+                    '_non_candidate_picks', '_all_picks')
+
+    def __init__(self, all_candidates, all_picks, dt=None, branch_rules=None, cache_path=None,
+                 cache_max_bytes=DEFAULT_MAX_BYTES, tiled=None, layout='secret',
+                 memo_max_routes=DEFAULT_MAX_ROUTES, subtree_cache=True,
+                 max_workers=None, pool=None,
+                 min_task_candidates=DEFAULT_MIN_TASK_CANDIDATES,
+                 exact_max_candidates=DEFAULT_EXACT_MAX_CANDIDATES,
+                 opening_book=True, prune_picks=True):
 
         # Remove duplicates and maintaining order, while guaranteeing picks
         # are the first candidates
@@ -270,47 +339,358 @@ class WordleTree():
         self.word_idx = {c:i for i, c in enumerate(all_picks)}
         self.idx_word = {i:c for i, c in enumerate(all_picks)}
 
+        self.word_length = len(next(iter(all_picks), '')) or 5
+        if any(len(word) != self.word_length for word in all_picks):
+            raise ValueError("All picks and candidates must be the same length")
+        self.all_green = Color.all_green(self.word_length)
+
         # Minimum parameters for best result are: 3,5,10,20
         if branch_rules is None:
             self.branch_rules = SortedDict({300:5, 10:10, 0:20}) # these were the default paramaters
         else:
             self.branch_rules = SortedDict(branch_rules) # these were the default paramaters
 
-        filename = Path(cache_path) / self.gen_matrix_filename()
+        self.matrix_cache = MatrixCache(cache_path, cache_max_bytes)
+
+        # Lexicons too large for a dense matrix compute it lazily instead
+        if tiled is None:
+            tiled = len(all_picks) * len(all_candidates) > TILED_MATRIX_ELEMENTS
+
+        if layout not in ('pick', 'secret'):
+            raise ValueError(f"Unknown clue matrix layout: {layout}")
+
+        # The secret-major layout stores the matrix column-contiguous so the
+        # search can gather each node's candidates into a CandidateView. It
+        # only applies to dense matrices.
+        if tiled:
+            self.clue_matrix = TiledClueMatrix(all_picks, all_candidates)
+            self.layout = 'pick'
+        else:
+            self.clue_matrix = self._load_clue_matrix(self.gen_matrix_filename())
+            self.layout = layout
+            if layout == 'secret':
+                self.clue_matrix = np.asfortranarray(self.clue_matrix)
+
+        # Picks equivalent or dominated over all candidates are dropped from
+        # searches. Tiled matrices are too large to analyze.
+        if prune_picks and not tiled:
+            self.pick_analysis = self._load_pick_analysis()
+        else:
+            self.pick_analysis = None
+
+        self.dt = dt
+        self._shared_tables = None
+
+        # Handle of this tree while it is published for a parallel search,
+        # and the decision tree of the search, which tasks refer to by ID
+        self.task_handle = None
+        self._search_dt = None
+        self._clue_index = None
+
+        # Subproblems solved during a search, unless memo_max_routes is None
+        self.memo_max_routes = memo_max_routes
+        self.transpositions = None
+
+        # Subtrees solved by previous searches with the same word lists
+        if subtree_cache and cache_path is not None:
+            self.subtree_cache = SubtreeCache(cache_path)
+        else:
+            self.subtree_cache = None
+        self._search_key = None
+        self._max_clues = None
+
+        # Rankings of the first levels, built offline for this clue matrix
+        if opening_book and cache_path is not None:
+            self.opening_book_path = str(Path(cache_path) /
+                self.gen_matrix_filename('opening_book_{}.npz'))
+        else:
+            self.opening_book_path = None
+        self.nodes_searched = 0
+
+        # Nodes with at most exact_max_candidates candidates are solved
+        # exactly rather than by the beam
+        self.exact_max_candidates = exact_max_candidates or 0
+
+        # Workers for parallel searches, started on first use unless a pool
+        # shared with other trees is specified. max_workers defaults to the
+        # number of available cores. Subproblems with fewer than
+        # min_task_candidates candidates are searched inline, not queued.
+        self.max_workers = max_workers
+        self.min_task_candidates = min_task_candidates
+        self._pool = pool
+        self._owns_pool = pool is None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        tables = state.pop('_shared_tables', None)
+        state['transpositions'] = None # workers keep their own
+        state['_pool'] = None
+        state['task_handle'] = None
+        state['_clue_index'] = None # rebuilt on use, it refers to the matrix
+        state['pick_analysis'] = None # only used to set up searches
+
+        if tables is not None:
+            for key in self._SHARED_KEYS:
+                if key != 'clue_matrix' or 'clue_matrix' in tables.keys:
+                    del state[key]
+            state['_shared_handle'] = tables.handle
+
+        return state
+
+    def __setstate__(self, state):
+        handle = state.pop('_shared_handle', None)
+        self.__dict__.update(state)
+        self._shared_tables = None
+
+        if self.memo_max_routes is not None:
+            self.transpositions = TranspositionTable(self.memo_max_routes)
+
+        if handle is not None:
+            tables = attach(handle)
+
+            # Word tables are derived once per process and kept with the
+            # attached arrays for subsequent tasks
+            if 'word_idx' not in tables:
+                all_picks = tuple(tables['words'].tolist())
+                n_candidates = int(tables['n_candidates'])
+                tables['_all_picks'] = all_picks
+                tables['_all_candidates'] = all_picks[:n_candidates]
+                tables['_non_candidate_picks'] = dict.fromkeys(all_picks[n_candidates:])
+                tables['word_idx'] = {c:i for i, c in enumerate(all_picks)}
+                tables['idx_word'] = {i:c for i, c in enumerate(all_picks)}
+
+            for key in self._SHARED_KEYS:
+                if key in tables:
+                    setattr(self, key, tables[key])
+
+    def search_pool(self):
+        ''' Return the pool of workers for parallel searches '''
+        if self._pool is None:
+            self._pool = SearchPool(self.max_workers)
+            self._owns_pool = True
+        return self._pool
+
+    def opening_book(self):
+        ''' Return the OpeningBook built for the clue matrix, or None '''
+        if self.opening_book_path is None:
+            return None
+        return load_book(self.opening_book_path)
+
+    def build_opening_book(self, n_openers=DEFAULT_OPENERS,
+                           n_top=DEFAULT_TOP_PICKS, candidates=None, picks=None):
+        '''
+        Rank every pick at the root of a search of candidates and picks, as
+        mod_dfs_beam_search does, and every second level response to its
+        n_openers best openers, and save the rankings as the opening book of
+        the clue matrix. Returns the OpeningBook.
+        '''
+        if self.opening_book_path is None:
+            raise ValueError("An opening book requires a cache path")
+
+        candidates, picks = self._fix_candidates_and_picks(candidates, picks)
+        candidates = candidate_array(candidates)
+        book = OpeningBook()
+
+        ranking = self.rank_picks(candidates, picks)
+        max_clues = int(ranking.n_groups.max(initial=1))
+        book.add(SEARCH, candidates, picks,
+                 BookEntry(Bitset.from_indices(ranking.picks), max_clues))
+        picks = Bitset.from_indices(ranking.picks)
+
+        view = self.candidate_view(candidates)
+        *rankings, new_picks, max_clues = self._rank_node(candidates, picks, view)
+        entry = BookEntry.from_rankings(*rankings, new_picks, max_clues, n_top)
+        book.add(NODE, candidates, picks, entry)
+
+        for pick in entry.top[:n_openers]:
+            clue_part = self.split_candidates_by_clue(candidates, pick, view)
+            for clue, rem_candidates in clue_part.items():
+                if clue == self.all_green or len(rem_candidates) == 1:
+                    continue
+                child_view = self.candidate_view(rem_candidates, view)
+                *rankings, child_picks, child_clues = self._rank_node(
+                    rem_candidates, new_picks, child_view)
+                book.add(NODE, rem_candidates, new_picks,
+                         BookEntry.from_rankings(*rankings, child_picks,
+                                                 child_clues, n_top))
+
+        book.save(self.opening_book_path)
+        return book
+
+    def clue_index(self):
+        ''' Return the ClueIndex of the secrets giving each clue for a pick '''
+        if self._clue_index is None:
+            self._clue_index = ClueIndex(self.clue_matrix)
+        return self._clue_index
+
+    def cancel(self):
+        ''' Abort the parallel search in progress, if any, and its tasks. May
+        be called from another thread. '''
+        if self._pool is not None:
+            self._pool.stop()
+
+    def close(self):
+        ''' Shut down the worker pool, unless it is shared '''
+        if self._pool is not None and self._owns_pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    @contextmanager
+    def share_tables(self):
+        '''
+        Publish the clue matrix and word tables in shared memory for the
+        duration of the context. While published, copies of this tree pickled
+        for worker processes carry only a handle and attach to the tables
+        zero-copy.
+        '''
+        if self._shared_tables is not None: # already published
+            yield self._shared_tables.handle
+            return
+
+        arrays = dict(words=np.array(self._all_picks),
+                      n_candidates=np.array(len(self._all_candidates)))
+
+        # Tiled matrices are pickled without their tiles instead
+        if isinstance(self.clue_matrix, np.ndarray):
+            arrays['clue_matrix'] = self.clue_matrix
 
         try:
-            self.clue_matrix = np.load(filename)
-        except FileNotFoundError as e:
-            logger.warning(f"No saved matrix data found, generating: {filename}")
-        except (OSError, ValueError, EOFError) as e:
+            tables = SharedArrays(**arrays)
+        except OSError as e:
             logger.warning(dedent(f"""
-                           Warning: Unable to read matrix data.
+                           Warning: Unable to share matrix data.
                            {format_exception_only(e)}
-                           Falling back to generation""").strip())
+                           Falling back to copying it to workers""").strip())
+            yield None
+            return
 
-        if not hasattr(self, 'clue_matrix'):
-            self.clue_matrix = self.precompute_clues(all_picks, all_candidates)
+        self._shared_tables = tables
+        try:
+            yield tables.handle
+        finally:
+            self._shared_tables = None
+            tables.close()
 
-            # XXX fixed by indenting, remove this comment before commit
+    @contextmanager
+    def publish_search(self):
+        '''
+        Share the tables, and publish this tree as set up for a search, for
+        the duration of the context. While published, tasks refer to the
+        tree by task_handle, and each worker unpickles it once per search.
+        '''
+        with self.share_tables():
             try:
-                os.makedirs(os.path.split(filename)[0], exist_ok=True)
-                np.save(filename, self.clue_matrix)
+                data = pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+                block = SharedArrays(tree=np.frombuffer(data, dtype=np.uint8))
+            except OSError as e:
+                logger.warning(dedent(f"""
+                               Warning: Unable to share search data.
+                               {format_exception_only(e)}
+                               Falling back to copying it to workers""").strip())
+                yield
+                return
+
+            self.task_handle = block.handle
+            try:
+                yield
+            finally:
+                self.task_handle = None
+                block.close()
+
+    def encode_task(self, args):
+        '''
+        Return a compact descriptor of the arguments of a subproblem, for a
+        task of a published search: the candidates and picks as Bitsets and
+        the history as int arrays. The search's decision tree is sent as the
+        ID 0, since subproblems follow it from the root by their history
+        rather than passing down subtrees. Any other decision tree is sent
+        whole.
+        '''
+        candidates, picks, pick_hist, clue_hist, dt, dt_depth = args
+        dt_ref = 0 if dt is self._search_dt else dt
+        return (Bitset.from_indices(candidates).bits, picks,
+                array('i', pick_hist), array('i', clue_hist), dt_ref, dt_depth)
+
+    def decode_task(self, descriptor):
+        ''' Return the subproblem arguments of a descriptor from encode_task '''
+        bits, picks, pick_hist, clue_hist, dt_ref, dt_depth = descriptor
+        dt = self._search_dt if dt_ref == 0 else dt_ref
+        return (Bitset(bits).indices(), picks, tuple(pick_hist),
+                tuple(clue_hist), dt, dt_depth)
+
+    def _load_clue_matrix(self, filename):
+        '''
+        Load the clue matrix from the cache, or else extract it from a cached
+        superset, derive it from a similar cached matrix, or compute it.
+        '''
+        cache = self.matrix_cache
+        picks, candidates = self._all_picks, self._all_candidates
+
+        def load():
+            try:
+                return cache.load(filename)
+            except (OSError, ValueError, EOFError) as e:
+                logger.warning(dedent(f"""
+                               Warning: Unable to read matrix data.
+                               {format_exception_only(e)}
+                               Falling back to generation""").strip())
+
+        # Profiles using subsets of other profiles' word lists share their
+        # cached matrix rather than saving a copy of their own
+        clue_matrix = load()
+        if clue_matrix is None:
+            clue_matrix = cache.extract(picks, candidates)
+        if clue_matrix is not None:
+            return clue_matrix
+
+        with cache.lock(filename):
+            # Another process may have generated it while we waited
+            clue_matrix = load()
+            if clue_matrix is not None:
+                return clue_matrix
+
+            logger.warning(f"No saved matrix data found, generating: {cache.path(filename)}")
+
+            # Derive from a matrix cached for similar word lists if possible
+            clue_matrix = cache.derive(picks, candidates)
+            if clue_matrix is None:
+                clue_matrix = self.precompute_clues(picks, candidates)
+
+            try:
+                cache.save(filename, clue_matrix, picks, candidates)
             except OSError as e:
                 logger.warning(dedent(f"""
                             Warning: Unable to save matrix data.
                             {format_exception_only(e)}""").strip())
 
-        self.dt = dt
+        return clue_matrix
+
+    def _load_pick_analysis(self):
+        ''' Load the PickAnalysis of the clue matrix from the cache, or else
+        compute it, caching it alongside the matrix if that is cached.
+        Matrices extracted from a superset are analyzed on every load. '''
+        filename = self.gen_matrix_filename()
+        analysis = self.matrix_cache.load_analysis(filename, self._all_picks)
+
+        if analysis is None:
+            analysis = PickAnalysis.from_matrix(self.clue_matrix,
+                                                len(self._all_candidates))
+            if not self.matrix_cache.path(filename).exists():
+                return analysis
+            try:
+                self.matrix_cache.save_analysis(filename, analysis, self._all_picks)
+            except OSError as e:
+                logger.warning(dedent(f"""
+                               Warning: Unable to save pick analysis.
+                               {format_exception_only(e)}""").strip())
+
+        return analysis
 
     @staticmethod
     def precompute_clues(picks, solutions):
-        clue_matrix = np.empty((len(picks), len(solutions)), dtype=np.uint8)
-
-        for i, pick in enumerate(picks):
-            for j, secret in enumerate(solutions):
-                clue = get_clue_for_secret(pick, secret)
-                clue_matrix[i, j] = Color.ordinal(clue)
-        return clue_matrix
+        ''' Compute the picks x solutions matrix of clue ordinals
+        '''
+        return compute_clue_matrix(picks, solutions)
 
 
     def set_branch_rules(self, branch_rules):
@@ -333,79 +713,184 @@ class WordleTree():
 
     def _fix_candidates_and_picks(self, candidates, picks):
         '''
-        Set up solution candidates and strategic picks, converting to numeric
-        indices if a set of words was specified. Otherwise, use all posible
-        candidates and picks.
+        Set up solution candidates and strategic picks as Bitsets, converting
+        to numeric indices if a set of words was specified. Otherwise, use all
+        posible candidates and picks.
         '''
         if candidates is not None:
-            candidates = frozenset(map(self.word_idx.get, candidates))
+            candidates = Bitset.from_indices(map(self.word_idx.get, candidates))
         else:
-            candidates = frozenset(map(self.word_idx.get, self._all_candidates))
+            candidates = Bitset.from_indices(map(self.word_idx.get, self._all_candidates))
 
         if picks is not None:
-            picks = frozenset(map(self.word_idx.get, (*candidates, *picks)))
+            picks = candidates | Bitset.from_indices(map(self.word_idx.get, picks))
         else:
             # XXX it might should be this instead
-            picks = frozenset(map(self.word_idx.get, self._all_candidates))
-            # picks = frozenset(map(self.word_idx.get, self._all_picks))
-        
+            picks = Bitset.from_indices(map(self.word_idx.get, self._all_candidates))
+            # picks = Bitset.from_indices(map(self.word_idx.get, self._all_picks))
+
+        if self.pick_analysis is not None:
+            picks = self.pick_analysis.prune(picks)
+
         return candidates, picks
 
 
     def mod_dfs_beam_search(self, candidates=None, picks=None, pick_hist=(),
                             clue_hist=(), dt=None, dt_depth=1, parallel=False,
-                            abort=None):
+                            abort=None, time_budget=None, node_budget=None,
+                            on_improve=None):
         ''' Top level wrapper for searching the Wordle pick/solution space
+
+        The search is anytime: on_improve, if specified, is called with each
+        complete route set that becomes the best found, as word tuples, and
+        its depth profile. If abort is set, time_budget seconds pass or
+        node_budget nodes are searched, the best route set found so far is
+        returned.
         '''
         candidates, picks = self._fix_candidates_and_picks(candidates, picks)
 
+        # A parallel search also stops when the pool is stopped by cancel
+        stop = abort
+        if parallel:
+            stop_event = self.search_pool().stop_event
+            stop_event.clear()
+            stop = stop_event if abort is None else CompoundEvent(abort, stop_event)
+
+        if time_budget is not None or node_budget is not None:
+            stop = SearchBudget(self, stop, time_budget, node_budget)
+
+        # Subtrees are shared by searches over the same words and picks
+        self._search_key = (self.gen_matrix_filename('{}') + ':' +
+                            words_key(map(self.idx_word.get, picks)))
+
         # Convert to numeric representation
         pick_hist = tuple(self.word_idx[word] for word in pick_hist)
         clue_hist = tuple(Color.ordinal(clue_str) for clue_str in clue_hist)
 
-        # Create a chain of filters to filter candidates that match only the
-        # previous picks and clues.
-        pipe = candidates
-        for pick, clue in zip(pick_hist, clue_hist):
-            pipe = filter((lambda secret, pick=pick, clue=clue: self.clue_matrix[pick, secret] == clue), pipe)
-
-        candidates = frozenset(pipe)
+        # Keep the candidates that match the previous picks and clues
+        candidates = candidate_array(self.get_valid_candidates(pick_hist, clue_hist, candidates))
 
         # Filter invalid picks and deduplicate redundant picks due to
-        # pick_hist/clue_hist
-        picks = [pick for _, pick, _ in
-                 filter(self.pick_valid,
-                        self.rank_expand_picks(candidates, picks)
-                        )
-                 ]
+        # pick_hist/clue_hist. No pick splits any subset of the candidates
+        # into more groups than it splits them, which bounds every node.
+        book = self.opening_book()
+        entry = book.lookup(SEARCH, candidates, picks) if book is not None else None
+        if entry is not None:
+            picks, self._max_clues = entry.picks, entry.max_clues
+        else:
+            try:
+                ranking = self.rank_picks(candidates, picks, abort=stop)
+            except SearchCancelled:
+                if abort is not None:
+                    abort.set() # signal monitor thread to terminate
+                return ()
+            picks = Bitset.from_indices(ranking.picks)
+            self._max_clues = int(ranking.n_groups.max(initial=1))
 
 
         dt = self.dt if dt is None else dt
 
-        all_routes = self.mod_dfs_beam_rec(candidates, picks, pick_hist,
-                                            clue_hist, dt, dt_depth,
-                                            parallel=parallel, abort=abort)
+        if self.memo_max_routes is not None:
+            self.transpositions = TranspositionTable(self.memo_max_routes)
+
+        best = None
+
+        def improve(routes):
+            nonlocal best
+            best = routes
+            if on_improve is not None:
+                on_improve(self._route_words(routes), depth_profile(routes))
+
+        self._search_dt = dt
+
+        with self.publish_search() if parallel else nullcontext():
+            try:
+                all_routes = self.mod_dfs_beam_rec(candidates, picks, pick_hist,
+                                                    clue_hist, dt, dt_depth,
+                                                    parallel=parallel, abort=stop,
+                                                    on_improve=improve)
+            except SearchCancelled:
+                all_routes = None
 
         if abort is not None:
             abort.set() # signal monitor thread to terminate
 
+        if self.subtree_cache is not None:
+            self.subtree_cache.evict()
+
+        if all_routes is None and stop is not None and stop.is_set():
+            all_routes = best # the best complete route set found in time
+        elif all_routes is not None and all_routes is not best:
+            improve(all_routes) # e.g. solved by the subtree cache
+
         if all_routes is None:
             return ()
         else:
-            return tuple(sorted(tuple(self.idx_word[pick] for pick in route)
-                                for route in all_routes))
+            return self._route_words(all_routes)
+
+    def _route_words(self, routes):
+        return tuple(sorted(tuple(self.idx_word[pick] for pick in route)
+                            for route in routes))
 
 
     def mod_dfs_beam_rec(self, candidates, picks, pick_hist=(), clue_hist=(),
                          dt=None, dt_depth=1, best_profile=[], parallel=False,
-                         abort=None):
-
-        ''' Recursive version of a modified beam search
+                         abort=None, parent_view=None, incumbent=None,
+                         on_improve=None):
+
+        ''' Recursive version of a modified beam search. parent_view is the
+        CandidateView of the parent node, if any, from which this node's view
+        is gathered. incumbent, if specified, publishes a tighter bound than
+        best_profile as siblings searched elsewhere complete. on_improve, if
+        specified, is called with each route set that becomes the node's best.
         '''
+        self.nodes_searched += 1
+
         # Check to be sure if we're at the goal already
-        if next(iter(clue_hist[-1:]), None) == Color.all_green():
+        if next(iter(clue_hist[-1:]), None) == self.all_green:
             return []
 
+        # Look the candidates up in case they were already solved, in this
+        # search or a previous one. Nodes steered by the decision tree depend
+        # on their picks, so they aren't.
+        memo, memo_key = self.transpositions, None
+        subtrees, subtree_key = self.subtree_cache, None
+        bound = tuple(best_profile)
+        steered = dt and self.follow_dt(dt, pick_hist, int(candidates[0])) is not None
+
+        if memo is not None and not steered:
+            memo_key = (candidate_set_key(candidates), len(pick_hist),
+                        tuple(self.branch_rules.items()))
+            found, result = memo.lookup(memo_key, pick_hist, bound)
+            if found:
+                return result
+
+        if (subtrees is not None and not steered and
+            len(candidates) >= subtrees.min_candidates):
+            subtree_key = (self._search_key,
+                           words_key(map(self.idx_word.get, candidates.tolist())),
+                           json.dumps([[*self.branch_rules.items()],
+                                       self.exact_max_candidates]))
+            cached = subtrees.lookup(*subtree_key)
+
+            if cached is not None:
+                routes, _ = cached
+                routes = tuple(pick_hist + tuple(map(self.word_idx.get, route))
+                               for route in routes)
+                if memo_key is not None:
+                    memo.store(memo_key, pick_hist, (), routes)
+                return routes if profile_fits(depth_profile(routes), bound) else None
+
+        # Give up on candidates that can't be solved within the bound however
+        # well they are split. Nodes steered by the decision tree may use
+        # picks outside the search, so their descendants aren't bounded.
+        bounded = not steered and self._max_clues is not None
+
+        if bounded and best_profile and not profile_fits(
+                min_profile(len(candidates), len(pick_hist), self._max_clues),
+                best_profile):
+            return None
+
         # XXX I'm thiking we should check best_profile here if it's not checked
         # b4 call and... the last nonzero should be +
 
@@ -418,43 +903,52 @@ class WordleTree():
 
         logger.debug(f"Starting node for candidates: {len(candidates)}")
 
-        # Create an iterator of candidates to consider for top picks
-        seen = {} # use this for folding redundant picks
-        candidate_rank = [*self.rank_expand_picks(candidates, candidates, seen, pick_hist)]
-        # XXX The seen thing.. frozenset for folding.  needs to happen accrsoss calls
-        # BUT, we wanna do canddidates first and picks in a lazy manner
-        # is REP? seen is in REP, but frozenset in Split.
-        # move frozenset gen to REP?
-
-        # Create an iterator of strategic picks to consider for top picks
-        unranked_picks = (pick for pick in picks if pick not in candidates)
-
-        # careful about scope.. candidates could be different maybe
-        pipe = self.rank_expand_picks(candidates, unranked_picks, seen)
-        for pred in [self.pick_valid]:
-            pipe = filter(pred, pipe)
-
-        # Q: why did we collapse this previously?
-        # A: b/c i think we get it into new picks before it is passed to
-        # get_top_picks
-        pick_rank = LazyList(pipe)
-
-        # should filter out candidates to expand
-        # so then can we just look at the values of _seen_ for newpicks? ? or maybe 1st
-        # value in the list? if we use _seen_ there might be a chance it gets modified
-        # before collapse.. or a r/cond or something
-
-        new_picks = LazyList(pick for _, pick, _ in chain(candidate_rank, pick_rank))
+        # Gather the clues for this node's candidates once for all picks and
+        # for the views of child nodes
+        view = self.candidate_view(candidates, parent_view)
+
+        # Small candidate sets are solved exactly, using every pick
+        if not steered and len(candidates) <= self.exact_max_candidates:
+            result = self.solve_exact(candidates, picks, pick_hist, view, abort)
+            self._store_result(memo_key, subtree_key, pick_hist, bound, result)
+            if result is not None and profile_fits(depth_profile(result), bound):
+                return result
+            return None
+
         final_route_sets = []
         final_branch = best_profile and len(pick_hist) + 1 == len(best_profile)
         logger.debug(f'{len(pick_hist) = } {len(best_profile) = }')
 
-        for pick, clue_part in self.get_top_picks(pick_rank, candidate_rank,
-                                                  pick_hist, clue_hist, dt,
-                                                  dt_depth, final_branch):
+        # The first levels branch on the picks booked for them, if any
+        top_picks = None
+        if not steered and len(pick_hist) < BOOK_DEPTH:
+            book = self.opening_book()
+            entry = book.lookup(NODE, candidates, picks) if book is not None else None
+            if entry is not None:
+                rule_index = self.branch_rules.bisect_right(entry.n_candidates) - 1
+                top_picks = entry.top_picks(self.branch_rules.values()[rule_index],
+                                            final_branch)
+
+        if top_picks is not None:
+            new_picks, max_clues = entry.picks, entry.max_clues
+            top_picks = [(pick, self.split_candidates_by_clue(candidates, pick, view))
+                         for pick in top_picks]
+        else:
+            candidate_rank, pick_rank, new_picks, max_clues = self._rank_node(
+                candidates, picks, view, abort)
+            top_picks = self.get_top_picks(pick_rank, candidate_rank, pick_hist,
+                                           clue_hist, dt, dt_depth, final_branch)
+
+        for pick, clue_part in top_picks:
             if abort and abort.is_set():
                 return None # Received signal from above to abort
 
+            if incumbent is not None:
+                published = incumbent.read()
+                if published is not None and profile_fits(published, best_profile):
+                    best_profile = published
+                    bound = tuple(published)
+
             routes = []
             working_profile = best_profile.copy()
             new_pick_hist = pick_hist + (pick,)
@@ -468,13 +962,19 @@ class WordleTree():
                 # XXX but break might not save us much really, the test is fast
                 # And I'm not sure that all subsequent picks will fail
 
+            if bounded and best_profile and not profile_fits(
+                    pick_min_profile(clue_part, len(pick_hist), max_clues,
+                                     self.all_green), best_profile):
+                logger.debug(f"dropping hopeless pick: {pick}")
+                continue
+
             for clue, rem_candidates in clue_part.items():
 
                 if len(rem_candidates) == 1:
                     # We've reached a solution
                     solution = new_pick_hist
-                    if clue != Color.all_green():
-                        solution += (*rem_candidates,) # avoids extra on expansion
+                    if clue != self.all_green:
+                        solution += tuple(rem_candidates.tolist()) # avoids extra on expansion
 
                     routes.append(solution)
                     if not tally_and_test([solution], working_profile):
@@ -488,17 +988,17 @@ class WordleTree():
                     logger.debug(f"Eval pick: level = {len(new_pick_hist)}, " +
                                  f"    {len(rem_candidates) = }\n" + 
                                  f"    {[self.idx_word[p] for p in new_pick_hist]}\n" +
-                                 f"    {[Color.seq_to_num_str(Color.from_ordinal(c)) for c in new_clue_hist]}")
+                                 f"    {[Color.seq_to_num_str(Color.from_ordinal(c, self.word_length)) for c in new_clue_hist]}")
 
                     # prepare a batch job: 
-                    batch_args.append((rem_candidates, frozenset(new_picks),
+                    batch_args.append((rem_candidates, new_picks,
                                        new_pick_hist, new_clue_hist, dt,
                                        dt_depth)) # , abort))
 
             else:
 
                 for result in self._beam_batch_helper(batch_args, working_profile,
-                                                    parallel, abort):
+                                                    parallel, abort, view):
                 
                     if abort and abort.is_set():
                         return None # Received signal from above to abort
@@ -509,52 +1009,94 @@ class WordleTree():
                         break
 
                 if routes:
-                    final_route_sets.append(tuple(routes))
+                    routes = tuple(routes)
+                    final_route_sets.append(routes)
                     # Keep the best lot of routes, although we might do this outside
                     # the loop instead for parallellism later.
                     route_depth = route_max_depth(routes)
                     # max_path = min(max_path, route_depth)
                     final_route_sets = [(min(final_route_sets, key=cmp_to_key(depth_cmp)))]
+                    if on_improve is not None and final_route_sets[0] is routes:
+                        on_improve(routes)
                     best_profile = depth_profile(final_route_sets[0]) # get best profile here
                     max_depth = len(best_profile)
                     max_depth_count = best_profile[-1]
 
-        return next(iter(final_route_sets), None)
+        result = next(iter(final_route_sets), None)
 
+        if not (abort and abort.is_set()):
+            self._store_result(memo_key, subtree_key, pick_hist, bound, result)
 
-    def _beam_batch_helper(self, batch_args, working_profile, parallel, abort):
+        return result
 
-        if parallel:
+    def _rank_node(self, candidates, picks, view=None, abort=None):
+        '''
+        Rank the picks of a node: candidates as picks first, as these can
+        generate an ideal solution, and then strategic picks, each scored in
+        one batch. Returns the PickRankings of both, the Bitset of the picks
+        that weren't folded, and the most clues any of them gives.
+        '''
+        seen = PickClasses() # use this for folding redundant picks
+        candidate_rank = self.rank_picks(candidates, candidates.tolist(), seen,
+                                         view, abort)
+
+        unranked_picks = picks - Bitset.from_indices(candidates)
+        pick_rank = self.rank_picks(candidates, unranked_picks, seen, view, abort)
+
+        # Only the picks that weren't folded are passed down, so none splits
+        # the candidates of any descendant into more than max_clues groups
+        new_picks = Bitset.from_indices(np.concatenate((candidate_rank.picks,
+                                                        pick_rank.picks)))
+        max_clues = int(max(candidate_rank.n_groups.max(initial=1),
+                            pick_rank.n_groups.max(initial=1)))
+        return candidate_rank, pick_rank, new_picks, max_clues
+
+    def _store_result(self, memo_key, subtree_key, pick_hist, bound, result):
+        ''' Record a node's result in the memo and subtree cache, for the keys
+        that were looked up '''
+        if memo_key is not None:
+            self.transpositions.store(memo_key, pick_hist, bound, result)
+
+        if subtree_key is not None and result is not None:
+            routes = [[self.idx_word[pick] for pick in route[len(pick_hist):]]
+                      for route in result]
+            self.subtree_cache.store(*subtree_key, routes, depth_profile(routes))
+
+    def solve_exact(self, candidates, picks, pick_hist=(), view=None, abort=None):
+        '''
+        Return the best route set for a small sorted int array of candidates
+        from an exhaustive search of picks, or None if no pick splits them.
+        '''
+        picks = candidate_array(picks)
+        block = self.clue_block(picks, candidates, view).T
+        solver = ExactSolver(block, picks, candidates, self.all_green, abort)
+        routes = solver.routes(pick_hist=pick_hist)
+        return None if routes is None else tuple(routes)
 
-            with Manager() as manager:
-                stop_workers = manager.Event()
-                all_abort = CompoundEvent(stop_workers)
-
-                monitor_started = False
-                processing_finished = False
-
-                with ProcessPoolExecutor(max_workers=5) as executor:
-                    futures = []
-
-                    for args in batch_args:
-                        futures.append(executor.submit(self.mod_dfs_beam_rec,
-                                                       *args, working_profile,
-                                                       abort=all_abort))
-                    
-                    for future in as_completed(futures):
-                        result = future.result()
-                        if (not (abort and abort.is_set())) and result is not None and tally_and_test(result, working_profile):
-                            yield result
-                        else:
-                            stop_workers.set()
-                            yield None
-                            # break
-                # executor.shutdown(wait=True)
+
+    def _beam_batch_helper(self, batch_args, working_profile, parallel, abort,
+                           view=None):
+        # Views are only handed down within a process. Workers gather their
+        # own from the (shared) clue matrix.
+
+        if parallel:
+            # Workers schedule their own batches too
+            scheduler = current_scheduler() or self.search_pool().scheduler
+            results = scheduler.run_batch(self, batch_args, working_profile,
+                                          abort, self.min_task_candidates)
+            with closing(results): # cancels any tasks still running
+                for result in results:
+                    if (not (abort and abort.is_set())) and result is not None and tally_and_test(result, working_profile):
+                        yield result
+                    else:
+                        yield None
+                        break
 
         else:
             for args in batch_args:
 
-                result = self.mod_dfs_beam_rec(*args, working_profile, parallel, abort)
+                result = self.mod_dfs_beam_rec(*args, working_profile, parallel,
+                                               abort, parent_view=view)
 
                 if (not (abort and abort.is_set())) and result is not None and tally_and_test(result, working_profile):
                     yield result
@@ -564,19 +1106,18 @@ class WordleTree():
 
 
     def get_valid_candidates(self, pick_hist=(), clue_hist=(), candidates=None):
+        ''' Return the Bitset of candidates giving clue_hist for pick_hist '''
 
         if candidates is None:
             candidates = map(self.word_idx.get, self._all_candidates)
 
-        candidates = list(candidates)
-        if None in candidates:
-            raise ValueError
-
-        pipe = candidates
-        for pick, clue in zip(pick_hist, clue_hist):
-            pipe = filter((lambda secret, pick=pick, clue=clue: self.clue_matrix[pick, secret] == clue), pipe)
+        if not isinstance(candidates, Bitset):
+            candidates = list(candidates)
+            if None in candidates:
+                raise ValueError
+            candidates = Bitset.from_indices(candidates)
 
-        return frozenset(pipe)
+        return self.clue_index().filter(candidates, pick_hist, clue_hist)
 
     def get_valid_candidate_words(self, pick_word_hist=(), clue_color_hist=(),
                                   candidates=None):
@@ -601,33 +1142,41 @@ class WordleTree():
         return [count * 2 for count in counts.values()]
 
 
-    @staticmethod
-    def pick_valid(item):
+    def pick_valid(self, item):
         '''Method that returns true if a pick should be culled according to its
         clue distribution'''
         rank, pick, clue_part = item
-        return len(clue_part) > 1 or Color.all_green() in clue_part
+        return len(clue_part) > 1 or self.all_green in clue_part
 
 
     def get_distribution(self, candidates, pick): #, word_ns, guess_word_n, matrix):
 
         return self._get_distribution(candidates, pick, self.clue_matrix)
 
-    def split_candidates_by_clue(self, candidates, pick):
-        ''' Return dict of {clue: set[candidate]} that are valid for this
-        initial list and guess
+    def candidate_view(self, candidates, parent=None):
         '''
-        candidates_by_clue = {}
-
-        for secret in candidates:
-            clue = self.clue_matrix[pick, secret]
-            candidates_by_clue.setdefault(clue, []).append(secret)
+        Return a CandidateView of the clue matrix for candidates, gathered from
+        the parent node's view if specified, or None if the layout doesn't use
+        views.
+        '''
+        if self.layout != 'secret':
+            return None
+        elif parent is not None:
+            return parent.child(candidates)
+        else:
+            return CandidateView.from_matrix(self.clue_matrix, candidates)
 
-        # Freeze all values
-        for clue, can in candidates_by_clue.items():
-            candidates_by_clue[clue] = frozenset(can)
+    def split_candidates_by_clue(self, candidates, pick, view=None):
+        ''' Return a Partition of a sorted int array of candidates by the clue
+        each gives for pick. If a view of the candidates is specified, the
+        clues are read from it instead of the clue matrix.
+        '''
+        if view is None:
+            row = self.clue_matrix[pick, candidates]
+        else:
+            row = view.row(pick)
 
-        return candidates_by_clue
+        return Partition.from_clues(candidates, row)
 
     def split_candidates_by_clue_alt(self, candiates, pick):
         ''' Return dict of {clue: list[candidate]} that are valid for this
@@ -671,18 +1220,21 @@ class WordleTree():
         #     # score = compute_heuristic(clue_part)
         #     yield (score, pick, clue_part)
 
-    def rank_expand_picks(self, candidates, picks, seen=None, pick_hist=None):
+    def rank_expand_picks(self, candidates, picks, seen=None, pick_hist=None,
+                          view=None):
         '''
         Generate picks along with its heuristic score and a dict of
         candidates partitioned by clue. Elements are a 3-tuple of
-        (pick, score, {clue:[candidates]})
+        (score, pick, Partition). view is an optional CandidateView of
+        candidates, a sorted int array.
         '''
-        seen = seen if seen is not None else {}
+        seen = seen if seen is not None else PickClasses()
         # currently pick_hist is not used, but maybe it should be
         # for pick in {*picks} - seen:
         for pick in filter(lambda p: p not in seen, picks):
-            clue_part = self.split_candidates_by_clue(candidates, pick)
-            part_sig = frozenset(clue_part.items())
+            # Picks giving the same clue for every candidate are equivalent,
+            # so the raw clue row is the signature of the partition
+            row = self.clue_matrix[pick, candidates] if view is None else view.row(pick)
             # XXX I am consdering leaving out the specific clue for the part_sig
             # part_sig = frozenset(clue_part.values())
             # because I _think_ that the clue that led to that subset of picks is
@@ -691,16 +1243,55 @@ class WordleTree():
             # But I'm not sure if that could lead to problems with route generation
             #
 
-            pool = seen.setdefault(part_sig, [])
-            pool.append(pick)
-
-            if len(pool) == 1: # this pick is not folded into another yet
+            if seen.fold([pick], row[None])[0]: # this pick is not folded into another yet
+                clue_part = Partition.from_clues(candidates, row)
                 # score = score_distribution(clue_part)
                 # score = compute_heuristic(clue_part)
-                score = sorted((len(v) for v in clue_part.values()), reverse=True)
+                score = clue_part.score()
                 yield (score, pick, clue_part)
 
 
+    def clue_block(self, picks, candidates, view=None):
+        '''
+        Return the (picks x candidates) block of clue ordinals, read from a
+        CandidateView of the candidates if specified.
+        '''
+        if view is not None:
+            return np.ascontiguousarray(view.clues[:, picks].T)
+        return self.clue_matrix[picks][:, candidates]
+
+    def rank_picks(self, candidates, picks, seen=None, view=None, abort=None):
+        '''
+        Batch version of rank_expand_picks. Scores picks together from
+        blocks of clues and returns a PickRanking of the valid picks that
+        weren't folded into an equivalent pick, in their original order.
+        seen is the PickClasses of the node, if picks were ranked before.
+        Large nodes are ranked in chunks, raising SearchCancelled between
+        them if abort is set.
+        '''
+        seen = seen if seen is not None else PickClasses()
+        if isinstance(picks, Bitset):
+            picks = picks.indices()
+        else:
+            picks = np.fromiter(picks, dtype=np.intp)
+
+        chunk = max(1, RANK_CHUNK_ELEMENTS // max(len(candidates), 1))
+        rankings = []
+
+        for start in range(0, max(len(picks), 1), chunk):
+            check_abort(abort)
+            chunk_picks = picks[start:start + chunk]
+            block = self.clue_block(chunk_picks, candidates, view)
+
+            # Fold picks with the same clues for every candidate
+            unfolded = seen.fold(chunk_picks, block)
+
+            ranking = PickRanking(chunk_picks[unfolded], block[unfolded],
+                                  candidates, self.all_green)
+            rankings.append(ranking.select(ranking.valid()))
+
+        return PickRanking.concatenate(rankings)
+
     def rank_and_group_picks(self, candidates, picks, pick_hist, dt=None, depth=2):
         ''' Return top "tops" distributions with highest scores, but gives the
         recomendations from a pre-defined decision tree for the first view levels
@@ -729,42 +1320,50 @@ class WordleTree():
         # Return the respective rankings
         return candidate_rank, pick_rank
         
+    def follow_dt(self, dt, pick_hist, secret):
+        '''
+        Follow the decision tree dt along pick_hist, with the clues each pick
+        gives for secret. Return the branch of dt reached, or None if dt
+        doesn't cover the picks and clues.
+        '''
+        branch = dt
+        for pick in pick_hist:
+            clue = Color.from_ordinal(self.clue_matrix[pick, secret], self.word_length)
+            # i think this is right
+            key = self.idx_word[pick]
+            if key not in branch or clue not in branch[key]:
+                return None
+            branch = branch[key][clue]
+
+        return branch
+
     def get_top_picks(self, pick_rank, candidate_rank, pick_hist, clue_hist,
                       dt=None, depth=2, final_branch=False):
         '''
         Return top picks as ranked by a heruistic along with a dict of
-        partitioned solution candidates, keyed by clue. The dt parameter can
-        optionally specifiy a decision tree, which will override top picks up
-        to the specified depth.
+        partitioned solution candidates, keyed by clue. pick_rank and
+        candidate_rank are the PickRankings of strategic picks and candidates.
+        The dt parameter can optionally specifiy a decision tree, which will
+        override top picks up to the specified depth.
         '''
 
         # depth means we follow the dt only. Otherwise, we recommend the dt
         # suggestion first
 
         dt_picks = {}
-        if dt and candidate_rank:
-            _, secret, _ = next(iter(candidate_rank), None)
-            branch = dt
-            best_guess = self.word_idx[next(iter(branch))]
-
-            for pick in pick_hist:
-                clue = Color.from_ordinal(self.clue_matrix[pick, secret])
-                # i think this is right
-                key = self.idx_word[pick]
-                if key not in branch or clue not in branch[key]:
-                    break
-                branch = branch[self.idx_word[pick]][clue]
-                best_guess = self.word_idx[next(iter(branch))]
+        branch = None
+        if dt and len(candidate_rank):
+            branch = self.follow_dt(dt, pick_hist, int(candidate_rank.picks[0]))
 
+        if branch is not None:
+            best_guess = self.word_idx[next(iter(branch))]
+            clue_part = self.split_candidates_by_clue(candidate_rank.candidates,
+                                                      best_guess)
+            logger.debug(f"perfect solution found at level {len(pick_hist) + 1}")
+            if len(pick_hist) < depth:
+                return [(best_guess, clue_part)] 
             else:
-                candidates = [candidate for _, candidate, _ in candidate_rank]
-                clue_part = self.split_candidates_by_clue(candidates, best_guess)
-                # score = score_distribution(clue_part)
-                logger.debug(f"perfect solution found at level {len(pick_hist) + 1}")
-                if len(pick_hist) < depth:
-                    return [(best_guess, clue_part)] 
-                else:
-                    dt_picks[best_guess] = clue_part
+                dt_picks[best_guess] = clue_part
 
         # # Number of bests to check.
         rule_index = self.branch_rules.bisect_right(len(candidate_rank)) - 1
@@ -775,50 +1374,31 @@ class WordleTree():
         if options > (len(pick_rank) + len(candidate_rank)):
             logger.debug(f"search exhuasting picks & candidates at level {len(pick_hist) + 1}")
 
-        allpicks = []
-        # Evaluate canddiates as pick, while checkng for an ideal solution
-
-        for score, pick, clue_part in candidate_rank:
-            # If the solution is ideal, return it immediately
-            if (len(candidate_rank) == len(clue_part) and all(len(n) == 1 for
-                n in clue_part.values())):
-                return [(pick, clue_part)]
-            allpicks.append((score, pick, clue_part))
-
-        # seen = {pick for _, pick, _ in allpicks}
-
-        # If no ideal solution was found, add in strategic picks to consider 
-        for score, pick, clue_part in pick_rank:
-            # Check for near-ideal solution
-            if (len(candidate_rank) == len(clue_part) and all(len(n) == 1 for
-                n in clue_part.values())):
-                logger.debug(f"near perfect solution found at level {len(pick_hist) + 1}")
-                return [(pick, clue_part)]
+        # If a candidate's solution is ideal, return it immediately
+        i = candidate_rank.first_perfect()
+        if i is not None:
+            return [(int(candidate_rank.picks[i]), candidate_rank.partition(i))]
 
-            allpicks.append((score, pick, clue_part))
+        # If no ideal solution was found, check strategic picks for a
+        # near-ideal solution
+        i = pick_rank.first_perfect()
+        if i is not None:
+            logger.debug(f"near perfect solution found at level {len(pick_hist) + 1}")
+            return [(int(pick_rank.picks[i]), pick_rank.partition(i))]
 
         if final_branch:  # This is the final level that will be explored, so
             return []     # any solution must be perfect or near-perfect
         
         logger.debug(f"{options = }, {len(candidate_rank) = }, {len(pick_rank) = }")
 
-        logger.debug(f"{len(allpicks) = }")
-
-        # Filter any picks that are already DT recommendations
-        allpicks = [p for p in allpicks if p[1] not in dt_picks]
-
-        # dt_tip = [(pick, clue_part) for (pick, clue_part) in dt_pick.items()]
-
-        # Collect the largest n=options values
-        if options == float('inf'):
-            best_n = allpicks
-            best_n.sort()
-            # key=cmp_to_key(lambda x, y: dist_cmp(x[2], y[2])))
-        else:
-            best_n = sorted(heapq.nsmallest(options, allpicks))
-            # key=cmp_to_key(lambda x, y: dist_cmp(x[2], y[2])))
+        # Collect the best n=options picks, other than DT recommendations,
+        # and only now materialize their partitions
+        best_n = best_picks((candidate_rank, pick_rank),
+                            None if options == float('inf') else options,
+                            exclude=dt_picks)
 
-        return [*dt_picks.items()] + [(pick, clue_part) for score, pick, clue_part in best_n]
+        return [*dt_picks.items()] + [(int(ranking.picks[i]), ranking.partition(i))
+                                      for ranking, i in best_n]
 
 
     def gen_routes(self, pick, abort=None):